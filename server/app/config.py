@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from functools import lru_cache
 from pydantic import BaseModel
 from pathlib import Path
 import os
@@ -13,6 +14,17 @@ ENV_DB_FILENAMES = {
     "test": "kbxy-test.db",
 }
 
+@lru_cache(maxsize=8)
+def _resolve_db_path(raw: str | None, default_filename: str) -> Path:
+    """按 (KBXY_DB_PATH, 默认文件名) 缓存解析结果，避免重复 expanduser/resolve"""
+    if raw:
+        p = Path(os.path.expanduser(raw))
+        if not p.is_absolute():
+            p = PROJECT_ROOT / "data" / p
+    else:
+        p = PROJECT_ROOT / "data" / default_filename
+    return p.resolve()
+
 class Settings(BaseModel):
     app_name: str = "kbxy-monsters-pro"
     # 仅支持 dev / test，其他值一律回落到 dev
@@ -28,9 +40,38 @@ class Settings(BaseModel):
     sqlite_busy_timeout_ms: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "4000"))
     sqlite_connect_timeout_s: float = float(os.getenv("SQLITE_CONNECT_TIMEOUT_S", "5"))
 
+    # SQLite 连接级缓存/IO 调优
+    # - cache_budget_kib：页缓存总预算（KiB），按读写池常驻连接数均分到每个连接（见 db.py）
+    # - mmap_size：内存映射读取的上限（字节），0 表示关闭
+    # - wal_autocheckpoint：WAL 累积多少页后自动 checkpoint
+    sqlite_cache_budget_kib: int = int(os.getenv("SQLITE_CACHE_BUDGET_KIB", "65536"))
+    sqlite_mmap_size: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    sqlite_wal_autocheckpoint: int = int(os.getenv("SQLITE_WAL_AUTOCHECKPOINT", "1000"))
+
+    # 写引擎连接池（QueuePool）：SQLite 写入本身串行，池不宜过大；使用 DATABASE_URL 时可按需调大
+    # - pool_timeout：池耗尽时等待连接的秒数；pool_recycle：连接最长复用秒数
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+
+    # SQLAlchemy 语句编译缓存与批量 INSERT 分页
+    # - query_cache_size：编译缓存条目数（默认 500），各路由的固定形状查询较多，适当放大避免被挤出
+    # - insertmanyvalues_page_size：executemany 式 INSERT 合并成单条多 VALUES 语句时每页的行数
+    db_query_cache_size: int = int(os.getenv("DB_QUERY_CACHE_SIZE", "1200"))
+    db_insertmanyvalues_page_size: int = int(os.getenv("DB_INSERTMANYVALUES_PAGE_SIZE", "5000"))
+
+    # 只读引擎（本地 SQLite 时启用）：WAL 下读不阻塞写，连接池可以比写引擎大
+    sqlite_read_pool_size: int = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+
+    # /stats 聚合结果的缓存秒数（写会话提交时会立即作废）；设为 0 即不缓存
+    stats_cache_ttl_s: float = float(os.getenv("STATS_CACHE_TTL_S", "30"))
+
     # 新增：标签识别配置
     # - tag_use_selected_only：是否只使用推荐技能进行标签识别（默认True）
     tag_use_selected_only: bool = os.getenv("TAG_USE_SELECTED_ONLY", "true").lower() in {"true", "1", "yes"}
+    # - tag_batch_size：后台批量打标签时每批的怪物数（一次并发 AI 调用 + 一次提交）
+    tag_batch_size: int = int(os.getenv("TAG_BATCH_SIZE", "10"))
 
     def normalized_env(self) -> str:
         return "test" if self.app_env == "test" else "dev"
@@ -46,13 +87,6 @@ class Settings(BaseModel):
             - 若为相对路径或仅文件名：拼到 <project-root>/data 下
         - 否则使用默认文件名（随环境变化），也拼到 <project-root>/data 下
         """
-        raw = self.kbxy_db_path
-        if raw:
-            p = Path(os.path.expanduser(raw))
-            if not p.is_absolute():
-                p = PROJECT_ROOT / "data" / p
-        else:
-            p = PROJECT_ROOT / "data" / self.default_db_filename()
-        return p.resolve()
+        return _resolve_db_path(self.kbxy_db_path, self.default_db_filename())
 
 settings = Settings()
\ No newline at end of file
@@ -2,9 +2,12 @@ from __future__ import annotations
 
 import os
 import logging
+import sqlite3
 from pathlib import Path
 
 from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from .config import settings
@@ -16,7 +19,7 @@ DB_INFO: dict[str, str | bool | int | float | None] = {
     "using_database_url": False,       # 是否使用了环境变量 DATABASE_URL
     "db_file_abs_path": None,          # 本地 DB 绝对路径
     "db_parent_dir": None,             # 父目录
-    "writable": None,                  # OK / FAIL / IGNORED
+    "writable": None,                  # OK / FAIL / IGNORED / UNKNOWN（首个连接建立前）
     "busy_timeout_ms": None,           # 实际生效的 busy_timeout（毫秒）
     "connect_timeout_s": settings.sqlite_connect_timeout_s,  # 连接时的超时时间（秒）
     "note": "",                        # 说明文字
@@ -43,51 +46,148 @@ else:
     except Exception as e:
         logger.error(f"[db] failed to create data directory {p.parent}: {e}")
 
-    # 检查父目录写权限
-    writable_ok = os.access(p.parent, os.W_OK)
     DB_INFO["db_file_abs_path"] = str(p)
     DB_INFO["db_parent_dir"] = str(p.parent)
-    DB_INFO["writable"] = "OK" if writable_ok else "FAIL"
+    # 写权限不在导入时用 os.access 探测（按真实 UID 判断，挂载卷/ACL 下不可靠），
+    # 由首个连接设置 WAL 时的实际结果决定
+    DB_INFO["writable"] = "UNKNOWN"
 
-    FINAL_DATABASE_URL = f"sqlite+pysqlite:///{p}"
+    # 用 URL.create 直接传入路径，不经字符串解析：目录名含 ? 或 # 时不会被截成查询串
+    FINAL_DATABASE_URL = URL.create("sqlite+pysqlite", database=str(p))
 
 # 连接参数：
 # - check_same_thread=False：允许跨线程使用同一连接池中的连接
 # - timeout：sqlite3.connect 的“打开连接时等待锁”超时（秒）
+# 连接池：大小/溢出/等待/回收均来自 settings，仅在方言默认使用 QueuePool 时传入
+# （如 DATABASE_URL=sqlite:// 内存库用 SingletonThreadPool，不接受这些参数）；
+# pool_pre_ping 仅对 DATABASE_URL（网络数据库）开启，本地文件连接不会“断线”，免去每次借出的 SELECT 1
+# 编译缓存/批量 INSERT 分页：见 settings.db_query_cache_size / db_insertmanyvalues_page_size
+_final_url = make_url(FINAL_DATABASE_URL)
+_uses_queue_pool = issubclass(_final_url.get_dialect().get_pool_class(_final_url), QueuePool)
+_pool_kwargs = dict(
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+) if _uses_queue_pool else {}
+
 engine = create_engine(
     FINAL_DATABASE_URL,
     echo=False,
     future=True,
+    query_cache_size=settings.db_query_cache_size,
+    insertmanyvalues_page_size=settings.db_insertmanyvalues_page_size,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=bool(DB_INFO["using_database_url"]),
     connect_args={
         "check_same_thread": False,
         "timeout": settings.sqlite_connect_timeout_s,
     },
+    **_pool_kwargs,
 )
 
+def _warn_pool_exhausted(dbapi_connection, connection_record, connection_proxy):
+    """连接全部借出时记一条告警：后续请求将排队等待 pool_timeout"""
+    pool = engine.pool
+    if pool.checkedout() >= settings.db_pool_size + settings.db_max_overflow:
+        logger.warning(f"[db] connection pool exhausted: {pool.status()}")
+
+# checkedout() 只有 QueuePool 才有
+if isinstance(engine.pool, QueuePool):
+    event.listen(engine, "checkout", _warn_pool_exhausted)
+
+# 每个连接的页缓存：总预算按读写池的常驻连接数（不含溢出连接）均分，
+# 避免 连接数 × 大缓存 把常驻内存放大十几倍；不低于 SQLite 默认的 2 MiB
+_steady_connections = settings.db_pool_size + settings.sqlite_read_pool_size
+_CACHE_SIZE_KIB = max(2048, int(settings.sqlite_cache_budget_kib) // max(1, _steady_connections))
+
+def _set_read_pragmas(cursor) -> None:
+    """读写连接共用的 PRAGMA：锁等待与缓存/IO 调优"""
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)};")
+    cursor.execute(f"PRAGMA cache_size={-_CACHE_SIZE_KIB};")
+    cursor.execute("PRAGMA temp_store=MEMORY;")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)};")
+
+def _readback_busy_timeout(cursor) -> None:
+    """回读实际生效的 busy_timeout，写入 DB_INFO 供启动日志展示"""
+    cursor.execute("PRAGMA busy_timeout;")
+    row = cursor.fetchone()
+    try:
+        DB_INFO["busy_timeout_ms"] = int(row[0]) if row and row[0] is not None else None
+    except Exception:
+        DB_INFO["busy_timeout_ms"] = None
+
+_busy_timeout_read = False
+
 @event.listens_for(engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
     """
     每个新连接建立时设置 SQLite PRAGMA：
     - WAL、foreign_keys、synchronous
     - busy_timeout（毫秒），用于写锁等待
-    并回读 busy_timeout 以便启动日志展示实际值
+    - cache_size / temp_store / mmap_size / wal_autocheckpoint：缓存与 IO 调优
+    busy_timeout 的回读只在第一个连接上做一次（各连接设置相同，无需重复）
     """
+    global _busy_timeout_read
     cursor = dbapi_connection.cursor()
-    # 写入 PRAGMA
-    cursor.execute("PRAGMA journal_mode=WAL;")
+    # 写入 PRAGMA；首个连接顺便以切换 WAL 的结果判定库文件是否可写
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL;")
+        row = cursor.fetchone()
+    except sqlite3.OperationalError:
+        if DB_INFO["writable"] == "UNKNOWN":
+            DB_INFO["writable"] = "FAIL"
+        cursor.close()
+        raise
+    if DB_INFO["writable"] == "UNKNOWN":
+        DB_INFO["writable"] = "OK" if row and str(row[0]).lower() == "wal" else "FAIL"
     cursor.execute("PRAGMA synchronous=NORMAL;")
     cursor.execute("PRAGMA foreign_keys=ON;")
-    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)};")
-    # 回读 busy_timeout
-    cursor.execute("PRAGMA busy_timeout;")
-    row = cursor.fetchone()
-    try:
-        DB_INFO["busy_timeout_ms"] = int(row[0]) if row and row[0] is not None else None
-    except Exception:
-        DB_INFO["busy_timeout_ms"] = None
+    _set_read_pragmas(cursor)
+    cursor.execute(f"PRAGMA wal_autocheckpoint={int(settings.sqlite_wal_autocheckpoint)};")
+    if not _busy_timeout_read:
+        _readback_busy_timeout(cursor)
+        _busy_timeout_read = True
     cursor.close()
 
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+# 只读引擎：本地 SQLite 时以 mode=ro 打开，独立连接池，供纯查询接口使用；
+# 使用 DATABASE_URL 时直接复用写引擎
+if DB_INFO["using_database_url"]:
+    read_engine = engine
+else:
+    # 路径经 Path.as_uri() 百分号编码（含 #、?、% 的目录与 Windows 盘符路径都能正确打开），
+    # 由 creator 直接以 uri=True 连接；URL 中不带库文件，需显式指定 QueuePool
+    _read_uri = f"{p.as_uri()}?mode=ro"
+
+    def _connect_read_only():
+        return sqlite3.connect(
+            _read_uri,
+            uri=True,
+            check_same_thread=False,
+            timeout=settings.sqlite_connect_timeout_s,
+        )
+
+    read_engine = create_engine(
+        "sqlite+pysqlite://",
+        creator=_connect_read_only,
+        poolclass=QueuePool,
+        echo=False,
+        future=True,
+        query_cache_size=settings.db_query_cache_size,
+        pool_size=settings.sqlite_read_pool_size,
+    )
+
+    @event.listens_for(read_engine, "connect")
+    def set_sqlite_read_pragma(dbapi_connection, connection_record):
+        """只读连接：不改 journal_mode（由写连接设为 WAL），额外开启 query_only"""
+        cursor = dbapi_connection.cursor()
+        _set_read_pragmas(cursor)
+        cursor.execute("PRAGMA query_only=ON;")
+        cursor.close()
+
+# expire_on_commit=False：提交后对象保留已加载的属性，序列化响应/长事务批处理时不会逐个对象重新 SELECT；
+# 需要数据库最新值的地方显式 db.refresh()
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False, future=True)
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False, expire_on_commit=False, future=True)
 Base = declarative_base()
 
 def startup_db_report_lines() -> list[str]:
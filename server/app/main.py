@@ -1,18 +1,29 @@
 # server/app/main.py
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
+import threading
+from contextlib import asynccontextmanager
 from pathlib import Path
 
+import orjson
+
+try:
+    import fcntl  # POSIX；Windows 下不可用时退回 O_EXCL 锁文件
+except ImportError:
+    fcntl = None
+
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles  # ← 新增
 
 from .config import settings
 from .db import Base, engine, startup_db_report_lines, DB_INFO
-from .middleware import TraceIDMiddleware
+from .models import ensure_indexes, ensure_collections_tables, ensure_collection_counters
+from .middleware import TraceIDMiddleware, APIGZipMiddleware
 
 from .routes import (
     health, monsters, skills, utils, crawl,
@@ -30,64 +41,30 @@ except Exception:
 
 logger = logging.getLogger("kbxy")
 
-app = FastAPI(title=settings.app_name)
-
-# CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.cors_origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# 追踪ID中间件
-app.add_middleware(TraceIDMiddleware)
-
-# ⚠️ 移除：不要在模块顶层执行 create_all（会与 --reload 竞态）
-# Base.metadata.create_all(bind=engine)
-
-# ---- 静态图片挂载 ----
-def _images_dir() -> str:
-    env_dir = os.getenv("MONSTERS_MEDIA_DIR")
-    if env_dir:
-        p = Path(env_dir).expanduser().resolve(); p.mkdir(parents=True, exist_ok=True); return str(p)
-    here = Path(__file__).resolve().parent  # server/app
-    p = here.parent / "images" / "monsters" # server/images/monsters
-    p.mkdir(parents=True, exist_ok=True)
-    return str(p)
-
-app.mount("/media/monsters", StaticFiles(directory=_images_dir(), html=False), name="monsters_media")
-app.mount("/images/monsters", StaticFiles(directory=_images_dir(), html=False), name="monsters_images")
-
-# 注册路由（基础）
-app.include_router(health.router)
-app.include_router(monsters.router)
-app.include_router(utils.router)
-app.include_router(skills.router)
-app.include_router(crawl.router)
-app.include_router(warehouse.router, prefix="", tags=["warehouse"])
-app.include_router(types.router)
-app.include_router(collections.router, prefix="", tags=["collections"])
-app.include_router(backup.router)  # ← 备份功能
-app.include_router(images_routes.router)  # ← 新增
-
-# 可选：tags
-if HAS_TAGS:
-    app.include_router(tags.router)
+def _create_schema():
+    """建缺失的表，并为已有表补建新增的索引、计数触发器（均幂等）"""
+    Base.metadata.create_all(bind=engine, checkfirst=True)
+    ensure_indexes(engine)
+    ensure_collection_counters(engine)
 
 def _init_schema_once_with_lock():
     """
     只在 dev/test 环境做一次 schema 初始化（create_all, checkfirst=True），
-    用文件锁避免 uvicorn --reload 进程/多次导入的竞态。
+    用文件锁避免 uvicorn --reload 进程/多次导入的竞态（POSIX 用 flock，其它平台用 O_EXCL 锁文件）。
     """
     if settings.app_env not in ("dev", "test"):
+        # 不做全量建表；但收藏夹表与 items_count 的计数触发器仍需确保存在（均幂等）
+        try:
+            ensure_collections_tables(engine)
+            ensure_collection_counters(engine)
+        except Exception:
+            logger.exception("[startup] ensure collection tables/counters failed.")
         return
 
     parent_dir = DB_INFO.get("db_parent_dir")
     if not parent_dir:
         try:
-            Base.metadata.create_all(bind=engine, checkfirst=True)
+            _create_schema()
             logger.info("[startup] schema create_all (DATABASE_URL) executed.")
         except Exception:
             logger.exception("[startup] schema init failed (DATABASE_URL).")
@@ -96,6 +73,21 @@ def _init_schema_once_with_lock():
     lock_dir = Path(str(parent_dir))
     lock_file = lock_dir / ".schema.init.lock"
 
+    if fcntl is not None:
+        # flock：进程退出时内核自动释放，不会留下陈旧锁；
+        # 后到者等先到者建完表再 checkfirst，一次 sqlite_master 查询即可返回
+        try:
+            with open(lock_file, "a") as fh:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+                try:
+                    _create_schema()
+                    logger.info("[startup] schema create_all executed (checkfirst=True).")
+                finally:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+        except Exception:
+            logger.exception("[startup] schema init failed.")
+        return
+
     acquired = False
     try:
         fd = os.open(str(lock_file), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
@@ -106,7 +98,7 @@ def _init_schema_once_with_lock():
 
     if acquired:
         try:
-            Base.metadata.create_all(bind=engine, checkfirst=True)
+            _create_schema()
             logger.info("[startup] schema create_all executed (checkfirst=True).")
         except Exception:
             logger.exception("[startup] schema init failed.")
@@ -118,20 +110,25 @@ def _init_schema_once_with_lock():
     else:
         logger.info("[startup] another process is initializing schema or it already exists; skip create_all.")
 
-# 启动日志：环境 + DB 路径三件套 +（受控的）schema 初始化
-@app.on_event("startup")
-async def _startup_logs_and_schema():
-    logger.info(f"[startup] APP_ENV={settings.app_env} APP_NAME={settings.app_name}")
-    for line in startup_db_report_lines():
-        logger.info(f"[startup] {line}")
-    _init_schema_once_with_lock()
-    # 预热图片索引（可选）
+def _warmup_image_index():
     try:
         from .services.image_service import get_image_resolver
-        get_image_resolver().reindex()
+        get_image_resolver()
     except Exception:
         logger.exception("[startup] image resolver warmup failed.")
-    
+
+# 生命周期：schema 初始化（受控）+ 启动日志 + 后台任务启停
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 建表放到线程里执行，不阻塞事件循环；多 worker 时由文件锁串行，后到者 checkfirst 即返回
+    await asyncio.to_thread(_init_schema_once_with_lock)
+    # 首个连接已建立，此时 DB_INFO 中的 writable / busy_timeout 为实际值
+    logger.info(f"[startup] APP_ENV={settings.app_env} APP_NAME={settings.app_name}")
+    for line in startup_db_report_lines():
+        logger.info(f"[startup] {line}")
+    # 预热图片索引（可选）：放到后台线程，不阻塞启动；首次创建单例时即完成索引
+    threading.Thread(target=_warmup_image_index, name="image-index-warmup", daemon=True).start()
+
     # 启动备份调度器
     try:
         from .services.backup_scheduler import backup_scheduler
@@ -139,9 +136,9 @@ async def _startup_logs_and_schema():
     except Exception:
         logger.exception("[startup] backup scheduler start failed.")
 
-# 关闭处理：停止备份调度器
-@app.on_event("shutdown")
-async def _shutdown_cleanup():
+    yield
+
+    # 关闭处理：停止备份调度器
     try:
         from .services.backup_scheduler import backup_scheduler
         await backup_scheduler.stop()
@@ -149,11 +146,68 @@ async def _shutdown_cleanup():
     except Exception:
         logger.exception("[shutdown] backup scheduler stop failed.")
 
-# 全局异常处理
+# 默认用 orjson 序列化响应（列表/详情等读多的接口收益最大）
+app = FastAPI(title=settings.app_name, default_response_class=ORJSONResponse, lifespan=lifespan)
+
+# CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=settings.cors_origins,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# 追踪ID中间件
+app.add_middleware(TraceIDMiddleware)
+
+# 静态图片挂载的路径前缀（挂载见下方）
+MEDIA_PREFIXES = ("/media/monsters", "/images/monsters")
+
+# 响应压缩：最后添加即最外层，压缩的是带 x-trace-id 的最终响应；
+# 列表 JSON 重复度高，level 1 压缩比已足够且 CPU 开销最小；静态图片不压缩
+app.add_middleware(APIGZipMiddleware, skip_prefixes=MEDIA_PREFIXES, minimum_size=1024, compresslevel=1)
+
+# 注意：不要在模块顶层执行 create_all（每次导入都会探测 sqlite_master，且与 --reload 竞态）；
+# 建表统一在 startup 中经 _init_schema_once_with_lock() 完成
+
+# ---- 静态图片挂载 ----
+def _images_dir() -> str:
+    env_dir = os.getenv("MONSTERS_MEDIA_DIR")
+    if env_dir:
+        p = Path(env_dir).expanduser().resolve(); p.mkdir(parents=True, exist_ok=True); return str(p)
+    here = Path(__file__).resolve().parent  # server/app
+    p = here.parent / "images" / "monsters" # server/images/monsters
+    p.mkdir(parents=True, exist_ok=True)
+    return str(p)
+
+app.mount(MEDIA_PREFIXES[0], StaticFiles(directory=_images_dir(), html=False), name="monsters_media")
+app.mount(MEDIA_PREFIXES[1], StaticFiles(directory=_images_dir(), html=False), name="monsters_images")
+
+# 注册路由（基础）
+app.include_router(health.router)
+app.include_router(monsters.router)
+app.include_router(utils.router)
+app.include_router(skills.router)
+app.include_router(crawl.router)
+app.include_router(warehouse.router, prefix="", tags=["warehouse"])
+app.include_router(types.router)
+app.include_router(collections.router, prefix="", tags=["collections"])
+app.include_router(backup.router)  # ← 备份功能
+app.include_router(images_routes.router)  # ← 新增
+
+# 可选：tags
+if HAS_TAGS:
+    app.include_router(tags.router)
+
+# 全局异常处理（与默认响应类一致，用 orjson 序列化）
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+    return ORJSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+
+# 500 响应体固定不变：模块加载时序列化一次，处理时直接复用字节
+_INTERNAL_ERROR_BODY = orjson.dumps({"detail": "internal server error"})
 
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(request: Request, exc: Exception):
-    return JSONResponse(status_code=500, content={"detail": "internal server error"})
\ No newline at end of file
+    return Response(content=_INTERNAL_ERROR_BODY, status_code=500, media_type="application/json")
\ No newline at end of file
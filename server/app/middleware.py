@@ -1,16 +1,52 @@
 # server/app/middleware.py
-import uuid
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
-from starlette.requests import Request
+import os
+from typing import Iterable
+
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+_TRACE_HEADER = b"x-trace-id"
+
+class TraceIDMiddleware:
+    """
+    纯 ASGI 中间件：为每个 HTTP 请求生成追踪 ID，写入 scope["state"]（即 request.state.trace_id），
+    并在响应头加上 x-trace-id。不走 BaseHTTPMiddleware，省去每请求额外的任务组与内存流。
+    """
 
-class TraceIDMiddleware(BaseHTTPMiddleware):
     def __init__(self, app: ASGIApp) -> None:
-        super().__init__(app)
-
-    async def dispatch(self, request: Request, call_next):
-        trace_id = str(uuid.uuid4())
-        request.state.trace_id = trace_id
-        response = await call_next(request)
-        response.headers["x-trace-id"] = trace_id
-        return response
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # 12 字节随机数的 hex（24 字符）：追踪用足够唯一，省去 UUID 对象构造与格式化
+        trace_id = os.urandom(12).hex()
+        scope.setdefault("state", {})["trace_id"] = trace_id
+        header = (_TRACE_HEADER, trace_id.encode("latin-1"))
+
+        async def send_with_trace_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), header]
+            await send(message)
+
+        await self.app(scope, receive, send_with_trace_id)
+
+
+class APIGZipMiddleware:
+    """
+    只压缩 API（JSON）响应：skip_prefixes 下的静态文件（PNG/JPG 已是压缩格式）直接放行，
+    既不白耗 CPU，也保留 FileResponse 的 Content-Length 与 Range/206 支持。
+    """
+
+    def __init__(self, app: ASGIApp, skip_prefixes: Iterable[str] = (), **gzip_options) -> None:
+        self.app = app
+        self.gzip = GZipMiddleware(app, **gzip_options)
+        self.skip_prefixes = tuple(skip_prefixes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and not scope["path"].startswith(self.skip_prefixes):
+            await self.gzip(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
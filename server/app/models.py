@@ -1,32 +1,58 @@
 # server/app/models.py
 from datetime import datetime
-import json
+import logging
+import orjson
 from sqlalchemy import (
     Column, Integer, String, Float, DateTime, Table, ForeignKey, Text,
-    UniqueConstraint, Boolean, Index, TypeDecorator
+    UniqueConstraint, Boolean, Index, TypeDecorator, inspect
 )
 from sqlalchemy.dialects.sqlite import JSON
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.ext.associationproxy import association_proxy
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 
 from .db import Base
 
 
 class UTF8JSON(TypeDecorator):
-    """自定义JSON类型，确保中文字符正确存储"""
+    """
+    自定义JSON类型，确保中文字符正确存储。
+    仍以 TEXT 存储：SQLite JSON1 的 json_extract 等函数可直接作用于文本 JSON（检索 all_forms 即依赖于此）；
+    JSONB 需 SQLite >= 3.45，且二进制格式会让旧库、备份与外部工具无法直接读取，故不切换。
+    """
     impl = Text
     cache_ok = True
 
     def process_bind_param(self, value, dialect):
+        # orjson 输出即紧凑、非 ASCII 原样的 UTF-8，与 json.dumps(ensure_ascii=False, separators=(',', ':')) 一致
         if value is not None:
-            return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+            return orjson.dumps(value).decode("utf-8")
         return value
 
     def process_result_value(self, value, dialect):
         if value is not None:
-            return json.loads(value)
+            return orjson.loads(value)
         return value
 
+class utcnow(FunctionElement):
+    """
+    SQL 端的 UTC 当前时间，用作 created_at/updated_at 的 default/onupdate：
+    时间戳直接写进 INSERT/UPDATE 语句，不再逐行调用 datetime.utcnow() 并绑定参数。
+    不涉及 DDL，已有库无需迁移。
+    """
+    type = DateTime()
+    inherit_cache = True
+
+@compiles(utcnow, "sqlite")
+def _sqlite_utcnow(element, compiler, **kw):
+    # 与 datetime.utcnow() 存储格式一致（微秒位补 0），排序与解析不受影响
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
 # 多对多：怪物 <-> 标签
 monster_tag = Table(
     "monster_tag",
@@ -64,33 +90,40 @@ class Monster(Base):
     all_forms: Mapped[list] = mapped_column(UTF8JSON, default=list)
 
     # 时间
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow())
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow(), onupdate=utcnow())
 
     # 关系
     tags = relationship("Tag", secondary=monster_tag, back_populates="monsters")
 
     # 关联对象关系：怪物 <-> MonsterSkill <-> 技能
+    # 默认懒加载；需要技能的查询在路由/服务里显式 selectinload，列表等接口不再附带一次 IN 查询
     monster_skills = relationship(
         "MonsterSkill",
         back_populates="monster",
         cascade="all, delete-orphan",
-        lazy="selectin",
+        lazy="select",
     )
 
     # 便捷代理：仍可通过 m.skills 直接拿到 Skill 列表（兼容读取）
     skills = association_proxy("monster_skills", "skill")
 
-
     # —— 新增：收藏关系（关联对象 + 代理至 Collection）——
     collection_links = relationship(
         "CollectionItem",
         back_populates="monster",
         cascade="all, delete-orphan",
-        lazy="selectin",
+        lazy="select",
     )
     collections = association_proxy("collection_links", "collection")
 
+    # 列表/仓库的常用排序与筛选组合：默认 updated_at 倒序；仓库按 possess 过滤；按属性筛选再按速度排
+    __table_args__ = (
+        Index("ix_monsters_updated_at", "updated_at"),
+        Index("ix_monsters_possess_updated_at", "possess", "updated_at"),
+        Index("ix_monsters_element_speed", "element", "speed"),
+    )
+
     def __repr__(self) -> str:
         return f"<Monster id={self.id} name={self.name!r} element={self.element!r}>"
 
@@ -129,7 +162,7 @@ class Skill(Base):
         "MonsterSkill",
         back_populates="skill",
         cascade="all, delete-orphan",
-        lazy="selectin",
+        lazy="select",
     )
 
     # 便捷代理：可通过 skill.monsters 直接看到怪物
@@ -153,20 +186,23 @@ class MonsterSkill(Base):
     __tablename__ = "monster_skills"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    monster_id: Mapped[int] = mapped_column(Integer, ForeignKey("monsters.id", ondelete="CASCADE"), index=True)
+    # monster_id 不单独建索引：uq_monster_skill_pair 与下方覆盖索引都以 monster_id 打头
+    monster_id: Mapped[int] = mapped_column(Integer, ForeignKey("monsters.id", ondelete="CASCADE"))
     skill_id: Mapped[int] = mapped_column(Integer, ForeignKey("skills.id", ondelete="CASCADE"), index=True)
 
     # 关系级字段
     selected: Mapped[bool] = mapped_column(Boolean, default=False)
 
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow())
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow(), onupdate=utcnow())
 
     monster = relationship("Monster", back_populates="monster_skills")
     skill = relationship("Skill", back_populates="monster_skills")
 
     __table_args__ = (
         UniqueConstraint("monster_id", "skill_id", name="uq_monster_skill_pair"),
+        # 覆盖索引：按 monster_id 取 skill_id + selected（如只用精选技能时）只读索引页，不回表
+        Index("ix_monster_skills_monster_skill_selected", "monster_id", "skill_id", "selected"),
     )
 
     def __repr__(self) -> str:
@@ -185,18 +221,20 @@ class Collection(Base):
     name: Mapped[str] = mapped_column(String(64), nullable=False, unique=True, index=True)
     color: Mapped[str | None] = mapped_column(String(16), nullable=True)
 
-    items_count: Mapped[int] = mapped_column(Integer, default=0)  # 冗余计数，批量增删时维护（可选）
+    items_count: Mapped[int] = mapped_column(Integer, default=0)  # 冗余计数，由 collection_items 上的触发器维护（见 ensure_collection_counters）
     last_used_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow())
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow(), onupdate=utcnow())
 
     # 关联对象：Collection <-> CollectionItem <-> Monster
+    # passive_deletes：删除收藏夹时不先把成员逐条加载再逐条 DELETE，交给外键 ON DELETE CASCADE 一次清理
     items = relationship(
         "CollectionItem",
         back_populates="collection",
         cascade="all, delete-orphan",
-        lazy="selectin",
+        lazy="select",
+        passive_deletes=True,
     )
     monsters = association_proxy("items", "monster")
 
@@ -217,7 +255,7 @@ class CollectionItem(Base):
     monster_id: Mapped[int] = mapped_column(
         Integer, ForeignKey("monsters.id", ondelete="CASCADE"), primary_key=True
     )
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow())
 
     collection = relationship("Collection", back_populates="items")
     monster = relationship("Monster", back_populates="collection_links")
@@ -232,15 +270,78 @@ class CollectionItem(Base):
 
 
 
-# ===================== 惰性建表工具 =====================
+# ===================== 建表工具 =====================
 
 def ensure_collections_tables(bind) -> None:
     """
-    在首次使用收藏夹能力前调用：
-        ensure_collections_tables(db.get_bind())
-    将仅为 Collection / CollectionItem 两张表执行 create_all（幂等）。
+    启动时调用一次（见 main._init_schema_once_with_lock）：
+    仅为 Collection / CollectionItem 两张表执行 create_all（幂等）；两表都已存在时不发任何 DDL。
     """
+    insp = inspect(bind)
+    if insp.has_table(Collection.__tablename__) and insp.has_table(CollectionItem.__tablename__):
+        return
     Base.metadata.create_all(
         bind,
         tables=[Collection.__table__, CollectionItem.__table__],
-    )
\ No newline at end of file
+    )
+
+# 已被复合索引覆盖、模型中不再声明的旧索引：旧库里留着只会拖慢写入
+_SUPERSEDED_INDEXES = ("ix_monster_skills_monster_id",)
+
+
+def ensure_indexes(bind) -> None:
+    """
+    补建模型中声明、但已有库里缺失的索引（create_all 对已存在的表不会补索引），并删除已被取代的旧索引。
+    只处理已存在的表；每个索引 checkfirst，幂等。旧库缺列导致的失败只记日志，不影响其余索引。
+    """
+    with bind.begin() as conn:
+        for name in _SUPERSEDED_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    existing = set(inspect(bind).get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        for index in table.indexes:
+            try:
+                index.create(bind, checkfirst=True)
+            except Exception as e:
+                logging.getLogger("kbxy").warning(f"[schema] skip index {index.name}: {e}")
+
+
+_COLLECTION_COUNTER_DDL = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_collection_items_count_ins
+    AFTER INSERT ON collection_items
+    BEGIN
+        UPDATE collections SET items_count = items_count + 1 WHERE id = NEW.collection_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_collection_items_count_del
+    AFTER DELETE ON collection_items
+    BEGIN
+        UPDATE collections SET items_count = items_count - 1 WHERE id = OLD.collection_id;
+    END
+    """,
+)
+
+def ensure_collection_counters(bind) -> None:
+    """
+    用 SQLite 触发器维护 Collection.items_count：成员增删（含 ORM 级联、外键级联删除）时在同一事务内 ±1，
+    Python 侧无需加载成员再计数。启动时建触发器（幂等），并校正与实际成员数不一致的行（旧库/从备份恢复）。
+    """
+    if bind.dialect.name != "sqlite":
+        return
+    existing = set(inspect(bind).get_table_names())
+    if not {"collections", "collection_items"} <= existing:
+        return
+    with bind.begin() as conn:
+        for ddl in _COLLECTION_COUNTER_DDL:
+            conn.exec_driver_sql(ddl)
+        conn.exec_driver_sql(
+            """
+            UPDATE collections
+            SET items_count = (SELECT COUNT(*) FROM collection_items ci WHERE ci.collection_id = collections.id)
+            WHERE items_count IS NOT (SELECT COUNT(*) FROM collection_items ci WHERE ci.collection_id = collections.id)
+            """
+        )
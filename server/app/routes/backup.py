@@ -1,10 +1,12 @@
 # server/app/routes/backup.py
 from typing import List, Optional, Dict, Any
 from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import logging
 
 from ..services.backup_service import backup_service
+from ..services.backup_scheduler import backup_scheduler
 
 logger = logging.getLogger("kbxy.backup_routes")
 
@@ -66,7 +68,9 @@ async def update_backup_config(config: BackupConfigUpdate) -> Dict[str, Any]:
     """更新备份配置"""
     try:
         config_dict = config.dict(exclude_unset=True)
-        return backup_service.update_config(**config_dict)
+        updated = backup_service.update_config(**config_dict)
+        backup_scheduler.notify_config_changed()
+        return updated
     except Exception as e:
         logger.error(f"Failed to update backup config: {e}")
         raise HTTPException(status_code=500, detail="更新备份配置失败")
@@ -79,7 +83,7 @@ async def create_backup(
 ) -> Dict[str, Any]:
     """创建备份"""
     try:
-        backup_info = backup_service.create_backup(backup.name)
+        backup_info = await run_in_threadpool(backup_service.create_backup, backup.name)
         
         # 如果提供了描述，更新备份信息
         if backup.description:
@@ -96,7 +100,7 @@ async def create_backup(
 async def list_backups() -> BackupListResponse:
     """列出所有备份"""
     try:
-        backups = backup_service.list_backups()
+        backups = await run_in_threadpool(backup_service.list_backups)
         return BackupListResponse(
             total=len(backups),
             backups=backups
@@ -110,7 +114,7 @@ async def list_backups() -> BackupListResponse:
 async def get_backup_info(backup_name: str) -> Dict[str, Any]:
     """获取特定备份的详细信息"""
     try:
-        backup_info = backup_service.get_backup_info(backup_name)
+        backup_info = await run_in_threadpool(backup_service.get_backup_info, backup_name)
         if not backup_info:
             raise HTTPException(status_code=404, detail="备份不存在")
         return backup_info
@@ -125,7 +129,7 @@ async def get_backup_info(backup_name: str) -> Dict[str, Any]:
 async def restore_backup(backup_name: str) -> RestoreResult:
     """还原备份"""
     try:
-        result = backup_service.restore_backup(backup_name)
+        result = await run_in_threadpool(backup_service.restore_backup, backup_name)
         return RestoreResult(
             success=True,
             message="备份还原成功",
@@ -148,7 +152,7 @@ async def restore_backup(backup_name: str) -> RestoreResult:
 async def delete_backup(backup_name: str) -> Dict[str, Any]:
     """删除备份"""
     try:
-        success = backup_service.delete_backup(backup_name)
+        success = await run_in_threadpool(backup_service.delete_backup, backup_name)
         if not success:
             raise HTTPException(status_code=404, detail="备份不存在或删除失败")
         
@@ -164,7 +168,7 @@ async def delete_backup(backup_name: str) -> Dict[str, Any]:
 async def trigger_auto_backup() -> Dict[str, Any]:
     """触发自动备份（如果满足条件）"""
     try:
-        backup_info = backup_service.create_auto_backup()
+        backup_info = await run_in_threadpool(backup_service.create_auto_backup)
         
         if backup_info is None:
             return {
@@ -187,7 +191,7 @@ async def get_backup_status() -> Dict[str, Any]:
     """获取备份状态"""
     try:
         config = backup_service.get_config()
-        backups = backup_service.list_backups()
+        backups = await run_in_threadpool(backup_service.list_backups)
         
         total_size = sum(backup.get("size", 0) for backup in backups)
         latest_backup = backups[0] if backups else None
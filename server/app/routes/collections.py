@@ -113,11 +113,6 @@ def api_update_collection(
         raise HTTPException(status_code=404, detail="collection not found")
     db.commit()
 
-    # 统计当前 items_count —— 使用 SQLAlchemy 2.x 正确计数方式
-    items_count = db.scalar(
-        select(func.count()).select_from(CollectionItem).where(CollectionItem.collection_id == collection_id)
-    ) or 0
-
     return CollectionOut(
         id=col.id,
         name=col.name,
@@ -125,7 +120,7 @@ def api_update_collection(
         created_at=getattr(col, "created_at", None),
         updated_at=getattr(col, "updated_at", None),
         last_used_at=getattr(col, "last_used_at", None),
-        items_count=int(items_count),
+        items_count=int(col.items_count or 0),
     )
 
 
@@ -219,11 +214,6 @@ def api_get_collection(collection_id: int, db: Session = Depends(get_db)):
     if not col:
         raise HTTPException(status_code=404, detail="collection not found")
 
-    # 统计 items_count —— 使用 SQLAlchemy 2.x 正确计数方式
-    total_items = db.scalar(
-        select(func.count()).select_from(CollectionItem).where(CollectionItem.collection_id == collection_id)
-    ) or 0
-
     return CollectionOut(
         id=col.id,
         name=col.name,
@@ -231,7 +221,7 @@ def api_get_collection(collection_id: int, db: Session = Depends(get_db)):
         created_at=getattr(col, "created_at", None),
         updated_at=getattr(col, "updated_at", None),
         last_used_at=getattr(col, "last_used_at", None),
-        items_count=int(total_items),
+        items_count=int(col.items_count or 0),
     )
 
 
@@ -6,6 +6,7 @@ from typing import Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, Query
 from pydantic import BaseModel
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
 from ..db import SessionLocal
@@ -78,7 +79,7 @@ def _upsert_one(db: Session, mon: MonsterRow, overwrite: bool = False, do_derive
     - 技能：
         * Skill 全局去重，唯一 (name, element, kind, power)
         * 通过 MonsterSkill 关联，记录 selected
-        * 在同一次 flush/commit 中，显式“去重 + 本地集合防重复 + 数据库查询兜底”，避免唯一约束冲突
+        * 已有关联一次查出后内存比对；新关联一条 INSERT ... ON CONFLICT DO NOTHING 批量写入，避免唯一约束冲突
     返回：(is_insert, affected_skills)
     """
     is_insert = False
@@ -155,7 +156,12 @@ def _upsert_one(db: Session, mon: MonsterRow, overwrite: bool = False, do_derive
             skills = upsert_skills(db, items)
             db.flush()
 
-            linked_local = set()  # (monster_id, skill_id)
+            # 一次查出该怪物已有的关联，内存比对：已有的只更新 selected，新增的一条 INSERT 批量写入
+            existing_links: Dict[int, M.MonsterSkill] = {
+                ms.skill_id: ms
+                for ms in db.query(M.MonsterSkill).filter(M.MonsterSkill.monster_id == m.id)
+            }
+            new_links: Dict[int, bool] = {}  # skill_id -> selected
             for sk in skills:
                 if not sk:
                     continue
@@ -163,36 +169,25 @@ def _upsert_one(db: Session, mon: MonsterRow, overwrite: bool = False, do_derive
                 skill_key = (sk.name, sk.element, sk.kind, sk.power, sk.pp)
                 is_selected = skill_key in selected_keys
 
-                pair_key = (m.id, sk.id)
-                if pair_key in linked_local:
-                    continue
+                ms = existing_links.get(sk.id)
+                if ms is None:
+                    new_links.setdefault(sk.id, is_selected)
+                elif ms.selected != is_selected:
+                    ms.selected = is_selected
+                    affected += 1
 
-                ms = (
-                    db.query(M.MonsterSkill)
-                    .filter(
-                        M.MonsterSkill.monster_id == m.id,
-                        M.MonsterSkill.skill_id == sk.id,
-                    )
-                    .first()
+            if new_links:
+                # Core 批量插入；ON CONFLICT DO NOTHING 兜底 uq_monster_skill_pair，无需逐条预查
+                res = db.execute(
+                    sqlite_insert(M.MonsterSkill)
+                    .values([
+                        {"monster_id": m.id, "skill_id": sid, "selected": sel}
+                        for sid, sel in new_links.items()
+                    ])
+                    .on_conflict_do_nothing(index_elements=["monster_id", "skill_id"])
                 )
-                if not ms:
-                    ms = M.MonsterSkill(
-                        monster_id=m.id,
-                        skill_id=sk.id,
-                        selected=is_selected,
-                    )
-                    db.add(ms)
-                    db.flush()
-                    linked_local.add(pair_key)
-                    affected += 1
-                else:
-                    changed = False
-                    if ms.selected != is_selected:
-                        ms.selected = is_selected
-                        changed = True
-                    if changed:
-                        db.flush()
-                        affected += 1
+                affected += max(res.rowcount or 0, 0)
+            db.flush()
 
     # 3) 派生计算已移除
 
@@ -1,15 +1,34 @@
 # server/app/routes/health.py
+import threading
+import time
+
 from fastapi import APIRouter
-from sqlalchemy import func
-from ..db import SessionLocal
+from sqlalchemy import event, exists, func, select
+from ..config import settings
+from ..db import ReadSessionLocal, SessionLocal
 from ..models import Monster, Tag, MonsterSkill
 import platform
 
 router = APIRouter()
 
+# /stats 结果短 TTL 缓存：三个聚合都要扫表，而数值变化很慢；
+# 写会话每次提交即作废（generation +1）；不经会话替换库文件的路径（如备份还原）需显式调用 invalidate_stats_cache()
+_STATS_LOCK = threading.Lock()
+_STATS_CACHE: dict = {"value": None, "expires_at": 0.0, "generation": 0}
+
+def invalidate_stats_cache() -> None:
+    """作废 /stats 缓存；计算中的结果因 generation 变化也不会写回"""
+    with _STATS_LOCK:
+        _STATS_CACHE["value"] = None
+        _STATS_CACHE["generation"] += 1
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_stats_cache_on_commit(session):
+    invalidate_stats_cache()
+
 @router.get("/health")
 def health():
-    with SessionLocal() as db:
+    with ReadSessionLocal() as db:
         m = db.query(Monster).count()
         t = db.query(Tag).count()
     return {
@@ -20,20 +39,42 @@ def health():
         "counts": {"monsters": m, "tags": t}
     }
 
-@router.get("/stats")
-def stats():
-    with SessionLocal() as db:
-        # 总怪物数量
-        total = db.query(Monster).count()
-        
-        # 有技能的怪物数量
-        with_skills = db.query(func.count(func.distinct(MonsterSkill.monster_id))).scalar() or 0
-        
-        # 标签总数
-        tags_total = db.query(Tag).count()
-        
+def _compute_stats() -> dict:
+    # 三个计数合成一条 SELECT（各自为标量子查询），一次往返取回
+    total_q = select(func.count()).select_from(Monster).scalar_subquery()
+    # 有技能的怪物数量：EXISTS 逐个命中 monster_id 索引即停，免去 DISTINCT 的去重排序
+    with_skills_q = (
+        select(func.count())
+        .select_from(Monster)
+        .where(exists().where(MonsterSkill.monster_id == Monster.id))
+        .scalar_subquery()
+    )
+    tags_total_q = select(func.count()).select_from(Tag).scalar_subquery()
+
+    with ReadSessionLocal() as db:
+        total, with_skills, tags_total = db.execute(
+            select(total_q, with_skills_q, tags_total_q)
+        ).one()
+
     return {
-        "total": total,
-        "with_skills": with_skills,
-        "tags_total": tags_total
+        "total": total or 0,
+        "with_skills": with_skills or 0,
+        "tags_total": tags_total or 0
     }
+
+@router.get("/stats")
+def stats():
+    now = time.monotonic()
+    with _STATS_LOCK:
+        if _STATS_CACHE["value"] is not None and now < _STATS_CACHE["expires_at"]:
+            return _STATS_CACHE["value"]
+        generation = _STATS_CACHE["generation"]
+
+    value = _compute_stats()
+
+    # 计算期间若有提交，则这份结果可能已过期，不写回缓存
+    with _STATS_LOCK:
+        if _STATS_CACHE["generation"] == generation:
+            _STATS_CACHE["value"] = value
+            _STATS_CACHE["expires_at"] = now + settings.stats_cache_ttl_s
+    return value
@@ -3,9 +3,9 @@ from typing import Optional, List, Tuple, Dict
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session, selectinload
-from sqlalchemy import select, func, or_, and_
+from sqlalchemy import select, func, or_, and_, delete as sa_delete
 
-from ..db import SessionLocal
+from ..db import SessionLocal, ReadSessionLocal
 from ..models import Monster, MonsterSkill, Skill, Tag, CollectionItem
 from ..schemas import MonsterIn, MonsterOut, MonsterList
 from ..services.monsters_service import list_monsters, upsert_tags
@@ -22,6 +22,15 @@ def get_db():
         db.close()
 
 
+def get_read_db():
+    """纯查询接口使用只读会话"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
 # ---------- 请求体验证 ----------
 class RawStatsIn(BaseModel):
     hp: float = Field(..., description="体力")
@@ -102,7 +111,7 @@ def list_api(
     page_size: int = 20,
     # ✅ 新增：前端点击“修复妖怪”时会传 need_fix=true
     need_fix: Optional[bool] = Query(None, description="仅返回需要修复的怪物（技能数为 0 或 > 5）"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """
     支持三种标签方式：
@@ -225,23 +234,12 @@ def list_api(
         total = query.order_by(None).count()
         items = (
             query
+            .options(selectinload(Monster.tags))
             .offset((page - 1) * page_size)
             .limit(page_size)
             .all()
         )
 
-    # 预加载集合（注意：不能对 association_proxy 做 loader）
-    ids = [m.id for m in items]
-    if ids:
-        _ = db.execute(
-            select(Monster)
-            .where(Monster.id.in_(ids))
-            .options(
-                selectinload(Monster.monster_skills).selectinload(MonsterSkill.skill),
-                selectinload(Monster.tags),
-            )
-        ).scalars().all()
-
     result = []
 
     for m in items:
@@ -267,11 +265,10 @@ def list_api(
 
 # ---------- 详情 ----------
 @router.get("/monsters/{monster_id}", response_model=MonsterOut)
-def detail(monster_id: int, db: Session = Depends(get_db)):
+def detail(monster_id: int, db: Session = Depends(get_read_db)):
     m = db.execute(
         select(Monster).where(Monster.id == monster_id).options(
-            selectinload(Monster.monster_skills).selectinload(MonsterSkill.skill),
-            selectinload(Monster.tags),
+            selectinload(Monster.tags),  # 详情不含技能（技能走 /monsters/{id}/skills）
         )
     ).scalar_one_or_none()
     if not m:
@@ -292,7 +289,7 @@ def detail(monster_id: int, db: Session = Depends(get_db)):
 
 # ---------- 只读：当前怪物的技能列表 ----------
 @router.get("/monsters/{monster_id}/skills", response_model=List[SkillOut])
-def monster_skills(monster_id: int, db: Session = Depends(get_db)):
+def monster_skills(monster_id: int, db: Session = Depends(get_read_db)):
     m = db.execute(
         select(Monster)
         .where(Monster.id == monster_id)
@@ -558,26 +555,25 @@ def update(monster_id: int, payload: MonsterIn, db: Session = Depends(get_db)):
 
 
 # ---------- 批量删除 ----------
+_DELETE_CHUNK = 900
+
 @router.delete("/monsters/bulk_delete")
 def bulk_delete(payload: BulkDeleteIn, db: Session = Depends(get_db)):
-    if not payload.ids:
+    ids = list(dict.fromkeys(payload.ids or []))
+    if not ids:
         return {"ok": True, "deleted": 0}
-    
-    # 查找需要删除的妖怪
-    monsters = db.execute(
-        select(Monster).where(Monster.id.in_(payload.ids))
-    ).scalars().all()
-    
+
+    # 直接批量 DELETE：标签/技能/收藏关联均为 ON DELETE CASCADE（foreign_keys=ON），
+    # 无需逐个加载 ORM 对象；分块避免超过 SQLite 的参数个数上限
     deleted_count = 0
-    for m in monsters:
-        # 清理标签关系 (monster_skills 会通过 cascade 自动删除)
-        if m.tags is not None:
-            m.tags.clear()
-        
-        # 删除妖怪本身
-        db.delete(m)
-        deleted_count += 1
-    
+    for i in range(0, len(ids), _DELETE_CHUNK):
+        stmt = (
+            sa_delete(Monster)
+            .where(Monster.id.in_(ids[i:i + _DELETE_CHUNK]))
+            .execution_options(synchronize_session=False)
+        )
+        deleted_count += db.execute(stmt).rowcount or 0
+
     db.commit()
     return {"ok": True, "deleted": deleted_count}
 
@@ -4,8 +4,8 @@ from __future__ import annotations
 from typing import List, Optional, Dict
 from fastapi import APIRouter, Depends, HTTPException, Body
 from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session, selectinload, joinedload
-from sqlalchemy import select, func
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import select
 
 from ..db import SessionLocal
 from ..models import Monster, Skill, MonsterSkill  # 确保这些模型存在
@@ -27,34 +27,6 @@ class SkillBasicIn(BaseModel):
 class SkillSetIn(BaseModel):
     skills: List[SkillBasicIn]
 
-# ---- 获取某怪物的技能列表（给前端详情展示）----
-@router.get("/monsters/{monster_id}/skills")
-def list_monster_skills(monster_id: int, db: Session = Depends(get_db)):
-    m = db.execute(
-        select(Monster)
-        .where(Monster.id == monster_id)
-        .options(
-            # 关键修复：不要加载 Monster.skills（association proxy），而是加载关系表再 joinedload 到 Skill
-            selectinload(Monster.monster_skills).joinedload(MonsterSkill.skill)
-        )
-    ).scalar_one_or_none()
-    if not m:
-        raise HTTPException(status_code=404, detail="monster not found")
-
-    out = []
-    for ms in (m.monster_skills or []):
-        # 兼容：Skill 上的 element/kind/power，关联表上保留 description
-        s = ms.skill
-        out.append({
-            "id": ms.id,
-            "name": s.name if s else "",
-            "element": getattr(s, "element", None),
-            "kind": getattr(s, "kind", None),
-            "power": getattr(s, "power", None),
-            "description": getattr(s, "description", None) or "",
-        })
-    return out
-
 # 内部：根据名称查找或新建 Skill
 def _get_or_create_skill(db: Session, name: str) -> Skill:
     sk = db.execute(select(Skill).where(Skill.name == name)).scalar_one_or_none()
@@ -108,12 +80,7 @@ def _set_monster_skills(db: Session, monster_id: int, payload: SkillSetIn):
 
     db.commit()
 
-@router.put("/monsters/{monster_id}/skills")
-def put_monster_skills(monster_id: int, body: SkillSetIn = Body(...), db: Session = Depends(get_db)):
-    _set_monster_skills(db, monster_id, body)
-    return {"ok": True}
-
-# 兼容：POST 也可用
+# 兼容：POST 也可用（GET/PUT 由 monsters 路由提供）
 @router.post("/monsters/{monster_id}/skills")
 def post_monster_skills(monster_id: int, body: SkillSetIn = Body(...), db: Session = Depends(get_db)):
     _set_monster_skills(db, monster_id, body)
@@ -2,13 +2,13 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Body
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import select, func
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 
 from ..db import SessionLocal
-from ..models import Monster, Tag
+from ..models import Monster, Tag, MonsterSkill
 from ..services.monsters_service import upsert_tags
 from ..config import settings
 from ..services.tags_service import (
@@ -33,6 +33,14 @@ def get_db():
     finally:
         db.close()
 
+def _monster_with_skills(monster_id: int):
+    """打标签需要技能文本：一并预加载 monster_skills -> skill"""
+    return (
+        select(Monster)
+        .where(Monster.id == monster_id)
+        .options(selectinload(Monster.monster_skills).selectinload(MonsterSkill.skill))
+    )
+
 # 依据 code 前缀分组，供 /schema 与统计使用
 def _code_category(code: str) -> str:
     if isinstance(code, str):
@@ -135,7 +143,7 @@ def suggest(monster_id: int, db: Session = Depends(get_db)):
     - derived_preview: 当前怪以现有数据计算的“新五轴派生”（0~120 整数），方便前端展示
     - i18n: 附带 code→中文映射，前端可以直接用
     """
-    m = db.execute(select(Monster).where(Monster.id == monster_id)).scalar_one_or_none()
+    m = db.execute(_monster_with_skills(monster_id)).scalar_one_or_none()
     if not m:
         raise HTTPException(404, "monster not found")
     tags = suggest_tags_for_monster(m, selected_only=settings.tag_use_selected_only)
@@ -157,7 +165,7 @@ def retag(monster_id: int, db: Session = Depends(get_db)):
     正则计算并落库：
       m.tags = upsert_tags(...)
     """
-    m = db.execute(select(Monster).where(Monster.id == monster_id)).scalar_one_or_none()
+    m = db.execute(_monster_with_skills(monster_id)).scalar_one_or_none()
     if not m:
         raise HTTPException(404, "monster not found")
 
@@ -184,7 +192,7 @@ def retag_ai(monster_id: int, db: Session = Depends(get_db)):
     AI 识别并落库（内部已做审计/修复/自由候选写盘——见 tags_service）：
       m.tags = upsert_tags(...)
     """
-    m = db.execute(select(Monster).where(Monster.id == monster_id)).scalar_one_or_none()
+    m = db.execute(_monster_with_skills(monster_id)).scalar_one_or_none()
     if not m:
         raise HTTPException(404, "monster not found")
 
@@ -231,7 +239,7 @@ def ai_batch(payload: BatchIds = Body(...), db: Session = Depends(get_db)):
 
     for mid in ids:
         try:
-            m = db.execute(select(Monster).where(Monster.id == mid)).scalar_one_or_none()
+            m = db.execute(_monster_with_skills(mid)).scalar_one_or_none()
             if not m:
                 failed += 1
                 details.append({"id": mid, "ok": False, "error": "monster not found"})
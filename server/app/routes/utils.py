@@ -1,6 +1,6 @@
 # server/app/routes/utils.py
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, lazyload
 from sqlalchemy import select
 from ..db import SessionLocal
 from ..models import Monster
@@ -16,7 +16,12 @@ def get_db():
 
 @router.post("/utils/backfill_raw_to_columns")
 def backfill_raw_to_columns(db: Session = Depends(get_db)):
-    mons = db.scalars(select(Monster)).all()
+    # 分批流式读取，不一次性物化全表，也不带出技能/收藏夹等关联
+    mons = db.scalars(
+        select(Monster)
+        .options(lazyload("*"))
+        .execution_options(yield_per=500)
+    )
     touched = 0
     for m in mons:
         ex = getattr(m, "explain_json", {})
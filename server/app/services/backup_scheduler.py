@@ -15,7 +15,9 @@ class BackupScheduler:
     def __init__(self):
         self._task: Optional[asyncio.Task] = None
         self._running = False
-        self._check_interval = 3600  # 每小时检查一次
+        self._check_interval = 3600  # 未启用或计算失败时，最长每小时检查一次
+        self._min_delay = 30  # 两次检查的最短间隔：到期但本轮未能完成备份时不至于空转
+        self._wakeup = asyncio.Event()
     
     async def start(self):
         """启动备份调度器"""
@@ -41,6 +43,25 @@ class BackupScheduler:
         
         logger.info("Backup scheduler stopped")
     
+    def notify_config_changed(self):
+        """备份配置变化后唤醒调度器，重新计算下次备份时间"""
+        self._wakeup.set()
+    
+    def _next_delay(self) -> float:
+        """睡到下次备份到期为止，而不是固定间隔轮询"""
+        remaining = backup_service.seconds_until_auto_backup()
+        if remaining is None:
+            return self._check_interval
+        return min(max(remaining, self._min_delay), self._check_interval)
+    
+    async def _sleep_until_due(self, delay: float):
+        """等待到期或被配置变更唤醒"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+    
     async def _scheduler_loop(self):
         """调度器主循环"""
         while self._running:
@@ -48,15 +69,17 @@ class BackupScheduler:
                 # 检查是否需要自动备份
                 if backup_service.should_auto_backup():
                     logger.info("Starting automatic backup...")
-                    backup_info = backup_service.create_auto_backup()
+                    # 打包是阻塞 IO，放到线程里跑，避免卡住事件循环
+                    # wait=True：手动备份正在进行时等它结束，而不是立即返回后马上再次到期重试
+                    backup_info = await asyncio.to_thread(backup_service.create_auto_backup, True)
                     
                     if backup_info:
                         logger.info(f"Automatic backup created: {backup_info['name']}")
                     else:
                         logger.debug("Auto backup conditions not met")
                 
-                # 等待下次检查
-                await asyncio.sleep(self._check_interval)
+                # 等待下次到期
+                await self._sleep_until_due(self._next_delay())
                 
             except asyncio.CancelledError:
                 logger.info("Backup scheduler cancelled")
@@ -1,18 +1,83 @@
 # server/app/services/backup_service.py
+import hashlib
 import os
 import shutil
 import sqlite3
+import tempfile
+import threading
 import zipfile
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional, Dict, Any
-import json
 import logging
 
+import orjson
+
 from ..config import settings, PROJECT_ROOT
 
 logger = logging.getLogger("kbxy.backup")
 
+# 归档时的读写块大小；zipfile.write 默认 8KiB 一块，大库文件会在解释器里空转
+_COPY_CHUNK = 1024 * 1024
+# 已经是压缩格式的图片再 deflate 只会白耗 CPU，直接存储
+_STORED_SUFFIXES = {'.jpg', '.jpeg', '.png'}
+
+
+def _archive_file(zipf: zipfile.ZipFile, src: Path, arcname: str) -> None:
+    """以大块流式方式把单个文件写入压缩包"""
+    zinfo = zipfile.ZipInfo.from_file(src, arcname)
+    if src.suffix.lower() in _STORED_SUFFIXES:
+        zinfo.compress_type = zipfile.ZIP_STORED
+    else:
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+    with open(src, 'rb') as fsrc, zipf.open(zinfo, 'w') as fdst:
+        shutil.copyfileobj(fsrc, fdst, _COPY_CHUNK)
+
+
+def _extract_member(zipf: zipfile.ZipFile, zi: zipfile.ZipInfo, dest: Path) -> None:
+    """
+    把单个成员流式解到 dest：先写同目录下的临时文件，整个成员读完（CRC 校验通过）后再 os.replace，
+    中途出错只丢临时文件，目标文件保持原样
+    """
+    fd, tmp = tempfile.mkstemp(dir=dest.parent, prefix=".restore-", suffix=".part")
+    try:
+        with zipf.open(zi) as fsrc, os.fdopen(fd, 'wb') as fdst:
+            shutil.copyfileobj(fsrc, fdst, _COPY_CHUNK)
+        os.replace(tmp, dest)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _dispose_db_engines() -> None:
+    """关闭读写引擎池中的空闲连接（还原替换库文件后，旧连接仍指向原文件）"""
+    from ..db import engine, read_engine  # 延迟导入，避免服务模块加载时建引擎
+    engine.dispose()
+    if read_engine is not engine:
+        read_engine.dispose()
+
+
+def _ensure_restored_schema() -> None:
+    """
+    还原的库可能来自旧版本：缺收藏夹表或计数触发器，items_count 也可能与成员数不一致；
+    与启动时一样补齐（均幂等），收藏夹接口直接读取 items_count
+    """
+    from ..db import engine
+    from ..models import ensure_collections_tables, ensure_collection_counters
+    ensure_collections_tables(engine)
+    ensure_collection_counters(engine)
+
+
+def _created_ts(info: Dict[str, Any]) -> float:
+    """备份创建时间转为数值排序键，无法解析的排在最后"""
+    try:
+        return datetime.fromisoformat(info["created_at"]).timestamp()
+    except Exception:
+        return float("-inf")
+
 
 class BackupService:
     """时光机式备份服务 - 类似macOS Time Machine"""
@@ -24,6 +89,15 @@ class BackupService:
         # 备份配置文件
         self.config_file = self.backup_root / "backup_config.json"
         self._load_config()
+        
+        # 备份索引缓存：{name: info}，备份目录 mtime 不变时直接复用
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._index_mtime: Optional[int] = None
+        
+        # 旧备份清理放到后台线程，同一时间只跑一个
+        self._cleanup_lock = threading.Lock()
+        # 备份互斥：同一时刻只打一个包，突发的自动备份触发合并为一次
+        self._backup_lock = threading.Lock()
     
     def _load_config(self):
         """加载备份配置"""
@@ -31,13 +105,13 @@ class BackupService:
             "auto_backup_enabled": False,
             "backup_interval_hours": 24,  # 24小时自动备份一次
             "max_backups": 30,  # 最多保留30个备份
-            "last_backup_time": None
+            "last_backup_time": None,
+            "last_backup_fingerprint": None  # 上次备份时数据文件的指纹
         }
         
         if self.config_file.exists():
             try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
+                config = orjson.loads(self.config_file.read_bytes())
                 self.config = {**default_config, **config}
             except Exception as e:
                 logger.error(f"Failed to load backup config: {e}")
@@ -49,8 +123,7 @@ class BackupService:
     def _save_config(self):
         """保存备份配置"""
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=2)
+            self.config_file.write_bytes(orjson.dumps(self.config, option=orjson.OPT_INDENT_2))
         except Exception as e:
             logger.error(f"Failed to save backup config: {e}")
     
@@ -75,68 +148,76 @@ class BackupService:
         Returns:
             备份信息字典
         """
+        with self._backup_lock:
+            return self._create_backup(backup_name)
+    
+    def _data_fingerprint(self) -> str:
+        """数据库与图片文件的 (名称, 大小, mtime) 指纹，只 stat 不读内容"""
+        entries = []
+        sources = (
+            (PROJECT_ROOT / "data", lambda n: ".db" in n),
+            (PROJECT_ROOT / "server" / "images" / "monsters", lambda n: True),
+        )
+        for root, accept in sources:
+            try:
+                with os.scandir(root) as it:
+                    for entry in it:
+                        if accept(entry.name) and entry.is_file():
+                            st = entry.stat()
+                            entries.append((str(root), entry.name, st.st_size, st.st_mtime_ns))
+            except FileNotFoundError:
+                continue
+        entries.sort()
+        return hashlib.sha1(repr(entries).encode("utf-8")).hexdigest()
+    
+    def _create_backup(
+        self,
+        backup_name: Optional[str] = None,
+        backup_type: str = "manual",
+        description: str = "手动备份",
+    ) -> Dict[str, Any]:
+        """创建备份（调用方需持有 _backup_lock）"""
         timestamp = datetime.now()
+        fingerprint = self._data_fingerprint()
         
         if not backup_name:
             # 简化备份文件名
             backup_name = timestamp.strftime('%m%d_%H%M')
         
-        backup_dir = self.backup_root / backup_name
-        backup_dir.mkdir(exist_ok=True)
+        zip_path = self.backup_root / f"{backup_name}.zip"
         
         try:
             # 创建备份信息文件
             backup_info = {
                 "name": backup_name,
                 "created_at": timestamp.isoformat(),
-                "type": "manual",  # manual 或 auto
+                "type": backup_type,  # manual 或 auto
                 "size": 0,
                 "files_count": 0,
-                "description": "手动备份"
+                "description": description
             }
             
-            # 1. 备份数据库
-            db_backup_path = backup_dir / "database"
-            db_backup_path.mkdir(exist_ok=True)
-            
             data_dir = PROJECT_ROOT / "data"
-            db_files_backed = []
-            
-            for db_file in data_dir.glob("*.db*"):
-                if db_file.is_file():
-                    dest_path = db_backup_path / db_file.name
-                    shutil.copy2(db_file, dest_path)
-                    db_files_backed.append(db_file.name)
-                    backup_info["files_count"] += 1
-            
-            # 2. 备份怪物图片
-            images_backup_path = backup_dir / "images"
-            images_backup_path.mkdir(exist_ok=True)
-            
             images_source = PROJECT_ROOT / "server" / "images" / "monsters"
+            db_files_backed = []
             images_backed = []
             
-            if images_source.exists():
-                for image_file in images_source.iterdir():
-                    if image_file.is_file() and image_file.suffix.lower() in ['.jpg', '.jpeg', '.png']:
-                        dest_path = images_backup_path / image_file.name
-                        shutil.copy2(image_file, dest_path)
-                        images_backed.append(image_file.name)
-                        backup_info["files_count"] += 1
-            
-            # 3. 创建压缩包（可选，节省空间）
-            zip_path = backup_dir.with_suffix('.zip')
+            # 源文件直接写入压缩包，不再先复制到临时目录再读一遍
             with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # 添加数据库文件
-                for db_file in db_backup_path.iterdir():
-                    zipf.write(db_file, f"database/{db_file.name}")
+                # 1. 备份数据库
+                for db_file in data_dir.glob("*.db*"):
+                    if db_file.is_file():
+                        _archive_file(zipf, db_file, f"database/{db_file.name}")
+                        db_files_backed.append(db_file.name)
+                        backup_info["files_count"] += 1
                 
-                # 添加图片文件
-                for img_file in images_backup_path.iterdir():
-                    zipf.write(img_file, f"images/{img_file.name}")
-            
-            # 删除临时目录，只保留zip
-            shutil.rmtree(backup_dir)
+                # 2. 备份怪物图片
+                if images_source.exists():
+                    for image_file in images_source.iterdir():
+                        if image_file.is_file() and image_file.suffix.lower() in ['.jpg', '.jpeg', '.png']:
+                            _archive_file(zipf, image_file, f"images/{image_file.name}")
+                            images_backed.append(image_file.name)
+                            backup_info["files_count"] += 1
             
             # 计算备份大小
             backup_info["size"] = zip_path.stat().st_size
@@ -147,15 +228,16 @@ class BackupService:
             
             # 保存备份信息
             info_file = zip_path.with_suffix('.json')
-            with open(info_file, 'w', encoding='utf-8') as f:
-                json.dump(backup_info, f, ensure_ascii=False, indent=2)
+            info_file.write_bytes(orjson.dumps(backup_info, option=orjson.OPT_INDENT_2))
+            self._invalidate_index()
             
             # 更新配置中的最后备份时间
             self.config["last_backup_time"] = timestamp.isoformat()
+            self.config["last_backup_fingerprint"] = fingerprint
             self._save_config()
             
-            # 清理旧备份
-            self._cleanup_old_backups()
+            # 清理旧备份（后台进行，不阻塞本次备份返回）
+            self._schedule_cleanup()
             
             logger.info(f"Backup created successfully: {backup_name}")
             return backup_info
@@ -163,43 +245,67 @@ class BackupService:
         except Exception as e:
             logger.error(f"Failed to create backup {backup_name}: {e}")
             # 清理失败的备份
-            if backup_dir.exists():
-                shutil.rmtree(backup_dir)
-            zip_path = backup_dir.with_suffix('.zip')
             if zip_path.exists():
                 zip_path.unlink()
             raise Exception(f"备份创建失败: {str(e)}")
     
-    def list_backups(self) -> List[Dict[str, Any]]:
-        """列出所有备份"""
-        backups = []
+    def _invalidate_index(self):
+        """备份增删或信息文件改写后使索引失效"""
+        self._index = None
+        self._index_mtime = None
+    
+    def _scan_backups(self) -> Dict[str, Dict[str, Any]]:
+        """扫描备份目录，结果按目录 mtime 缓存"""
+        dir_mtime = os.stat(self.backup_root).st_mtime_ns
+        if self._index is not None and self._index_mtime == dir_mtime:
+            return self._index
         
-        for backup_zip in self.backup_root.glob("*.zip"):
-            info_file = backup_zip.with_suffix('.json')
-            
-            if info_file.exists():
+        # 一次 scandir 拿到所有 zip 与信息文件，不再逐个 exists()
+        zips: Dict[str, os.DirEntry] = {}
+        info_names = set()
+        with os.scandir(self.backup_root) as it:
+            for entry in it:
+                stem, ext = os.path.splitext(entry.name)
+                if ext == '.zip':
+                    zips[stem] = entry
+                elif ext == '.json':
+                    info_names.add(stem)
+        
+        index: Dict[str, Dict[str, Any]] = {}
+        for name, entry in zips.items():
+            if name in info_names:
+                info_file = self.backup_root / f"{name}.json"
                 try:
-                    with open(info_file, 'r', encoding='utf-8') as f:
-                        backup_info = json.load(f)
-                    backups.append(backup_info)
+                    index[name] = orjson.loads(info_file.read_bytes())
                 except Exception as e:
                     logger.error(f"Failed to read backup info {info_file}: {e}")
             else:
                 # 没有信息文件，创建基础信息
-                stat = backup_zip.stat()
-                backup_info = {
-                    "name": backup_zip.stem,
+                stat = entry.stat(follow_symlinks=False)
+                index[name] = {
+                    "name": name,
                     "created_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
                     "type": "unknown",
                     "size": stat.st_size,
-                    "backup_path": backup_zip.name,
+                    "backup_path": entry.name,
                     "description": "未知备份"
                 }
-                backups.append(backup_info)
         
-        # 按创建时间倒序排列
-        backups.sort(key=lambda x: x["created_at"], reverse=True)
-        return backups
+        # 排序键在建索引时算一次，按创建时间倒序存放
+        keyed = sorted(
+            ((_created_ts(info), name) for name, info in index.items()),
+            reverse=True,
+        )
+        index = {name: index[name] for _, name in keyed}
+        
+        self._index = index
+        self._index_mtime = dir_mtime
+        return index
+    
+    def list_backups(self) -> List[Dict[str, Any]]:
+        """列出所有备份"""
+        # 索引已按创建时间倒序排列
+        return [dict(info) for info in self._scan_backups().values()]
     
     def get_backup_info(self, backup_name: str) -> Optional[Dict[str, Any]]:
         """获取特定备份的详细信息"""
@@ -209,8 +315,7 @@ class BackupService:
             return None
         
         try:
-            with open(info_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return orjson.loads(info_file.read_bytes())
         except Exception as e:
             logger.error(f"Failed to read backup info {backup_name}: {e}")
             return None
@@ -230,45 +335,49 @@ class BackupService:
             raise Exception(f"备份文件不存在: {backup_name}")
         
         try:
-            # 解压备份文件
-            temp_dir = self.backup_root / f"temp_restore_{backup_name}"
-            temp_dir.mkdir(exist_ok=True)
-            
-            with zipfile.ZipFile(backup_zip, 'r') as zipf:
-                zipf.extractall(temp_dir)
-            
             restored_files = []
-            
-            # 1. 还原数据库文件
-            db_backup_dir = temp_dir / "database"
             data_dir = PROJECT_ROOT / "data"
-            
-            if db_backup_dir.exists():
-                for db_file in db_backup_dir.iterdir():
-                    if db_file.is_file():
-                        dest_path = data_dir / db_file.name
-                        shutil.copy2(db_file, dest_path)
-                        restored_files.append(f"database/{db_file.name}")
-            
-            # 2. 还原图片文件
-            images_backup_dir = temp_dir / "images"
             images_target_dir = PROJECT_ROOT / "server" / "images" / "monsters"
             images_target_dir.mkdir(parents=True, exist_ok=True)
             
-            if images_backup_dir.exists():
-                # 清空现有图片
-                for existing_img in images_target_dir.iterdir():
-                    if existing_img.is_file():
-                        existing_img.unlink()
+            # 直接从压缩包流式写到目标位置，不再先整体解压到临时目录再复制一遍；
+            # 每个成员先写临时文件、读完再原子替换，压缩包损坏时不会留下写了一半的数据库
+            with zipfile.ZipFile(backup_zip, 'r') as zipf:
+                # 动任何现有文件之前先整体校验一遍 CRC
+                bad_member = zipf.testzip()
+                if bad_member is not None:
+                    raise Exception(f"备份文件已损坏: {bad_member}")
                 
-                for img_file in images_backup_dir.iterdir():
-                    if img_file.is_file():
-                        dest_path = images_target_dir / img_file.name
-                        shutil.copy2(img_file, dest_path)
-                        restored_files.append(f"images/{img_file.name}")
-            
-            # 清理临时目录
-            shutil.rmtree(temp_dir)
+                members = [zi for zi in zipf.infolist() if not zi.is_dir()]
+                db_members = [zi for zi in members if zi.filename.startswith("database/")]
+                img_members = [zi for zi in members if zi.filename.startswith("images/")]
+                
+                # 1. 还原数据库文件：替换前后都关闭池中连接，之后的请求重新打开的是还原后的库文件
+                if db_members:
+                    _dispose_db_engines()
+                for zi in db_members:
+                    name = Path(zi.filename).name
+                    _extract_member(zipf, zi, data_dir / name)
+                    restored_files.append(f"database/{name}")
+                if db_members:
+                    _dispose_db_engines()
+                    _ensure_restored_schema()
+                    # 库文件被整体替换，没有经过会话提交：显式作废 /stats 缓存
+                    from ..routes.health import invalidate_stats_cache
+                    invalidate_stats_cache()
+                
+                # 2. 还原图片文件：先逐个替换，全部成功后再删掉备份里没有的旧图片
+                if img_members:
+                    restored_images = set()
+                    for zi in img_members:
+                        name = Path(zi.filename).name
+                        _extract_member(zipf, zi, images_target_dir / name)
+                        restored_images.add(name)
+                        restored_files.append(f"images/{name}")
+                    
+                    for existing_img in images_target_dir.iterdir():
+                        if existing_img.is_file() and existing_img.name not in restored_images:
+                            existing_img.unlink()
             
             result = {
                 "backup_name": backup_name,
@@ -282,10 +391,6 @@ class BackupService:
             
         except Exception as e:
             logger.error(f"Failed to restore backup {backup_name}: {e}")
-            # 清理临时文件
-            temp_dir = self.backup_root / f"temp_restore_{backup_name}"
-            if temp_dir.exists():
-                shutil.rmtree(temp_dir)
             raise Exception(f"备份还原失败: {str(e)}")
     
     def delete_backup(self, backup_name: str) -> bool:
@@ -294,10 +399,9 @@ class BackupService:
         info_file = self.backup_root / f"{backup_name}.json"
         
         try:
-            if backup_zip.exists():
-                backup_zip.unlink()
-            if info_file.exists():
-                info_file.unlink()
+            backup_zip.unlink(missing_ok=True)
+            info_file.unlink(missing_ok=True)
+            self._invalidate_index()
             
             logger.info(f"Backup deleted: {backup_name}")
             return True
@@ -306,16 +410,34 @@ class BackupService:
             logger.error(f"Failed to delete backup {backup_name}: {e}")
             return False
     
+    def _schedule_cleanup(self):
+        """在后台线程中清理旧备份"""
+        t = threading.Thread(target=self._cleanup_in_background, name="backup-cleanup", daemon=True)
+        t.start()
+    
+    def _cleanup_in_background(self):
+        with self._cleanup_lock:
+            try:
+                self._cleanup_old_backups()
+            except Exception as e:
+                logger.error(f"Failed to clean up old backups: {e}")
+    
     def _cleanup_old_backups(self):
         """清理旧备份，保持最大数量限制"""
         max_backups = self.config.get("max_backups", 30)
         backups = self.list_backups()
         
         if len(backups) > max_backups:
-            # 删除最旧的备份
+            # 删除最旧的备份：直接 unlink，不再逐个 exists() 再删
             backups_to_delete = backups[max_backups:]
             for backup in backups_to_delete:
-                self.delete_backup(backup["name"])
+                name = backup["name"]
+                for suffix in ('.zip', '.json'):
+                    try:
+                        (self.backup_root / f"{name}{suffix}").unlink(missing_ok=True)
+                    except OSError as e:
+                        logger.error(f"Failed to delete backup {name}: {e}")
+            self._invalidate_index()
             
             logger.info(f"Cleaned up {len(backups_to_delete)} old backups")
     
@@ -338,23 +460,53 @@ class BackupService:
             logger.error(f"Failed to check auto backup timing: {e}")
             return False
     
-    def create_auto_backup(self) -> Optional[Dict[str, Any]]:
-        """创建自动备份"""
-        if not self.should_auto_backup():
+    def seconds_until_auto_backup(self) -> Optional[float]:
+        """距下次自动备份到期的秒数；未启用时返回 None"""
+        if not self.config.get("auto_backup_enabled", False):
             return None
         
-        # 简化自动备份文件名
-        backup_name = f"auto_{datetime.now().strftime('%m%d_%H%M')}"
-        backup_info = self.create_backup(backup_name)
-        backup_info["type"] = "auto"
-        backup_info["description"] = "自动备份"
+        last_backup = self.config.get("last_backup_time")
+        if not last_backup:
+            return 0.0
         
-        # 更新备份信息文件
-        info_file = self.backup_root / f"{backup_name}.json"
-        with open(info_file, 'w', encoding='utf-8') as f:
-            json.dump(backup_info, f, ensure_ascii=False, indent=2)
+        try:
+            last_backup_dt = datetime.fromisoformat(last_backup)
+            interval_hours = self.config.get("backup_interval_hours", 24)
+            elapsed = (datetime.now() - last_backup_dt).total_seconds()
+            return max(0.0, interval_hours * 3600 - elapsed)
+        except Exception as e:
+            logger.error(f"Failed to check auto backup timing: {e}")
+            return None
+    
+    def create_auto_backup(self, wait: bool = False) -> Optional[Dict[str, Any]]:
+        """创建自动备份
         
-        return backup_info
+        Args:
+            wait: 已有备份在进行时是否等它结束（调度器传 True，避免在锁被占用期间反复重试）
+        """
+        if not self.should_auto_backup():
+            return None
+        
+        # 已有备份在进行中：手动触发直接并入那一次；调度器则等它完成后再判断是否仍需备份
+        if not self._backup_lock.acquire(blocking=wait):
+            logger.info("Backup already in progress, auto backup coalesced")
+            return None
+        try:
+            # 拿到锁后再确认一次，前一次备份可能刚刚完成
+            if not self.should_auto_backup():
+                return None
+            # 自上次备份以来数据文件没有变化：最新备份已覆盖当前数据，跳过打包
+            if self._data_fingerprint() == self.config.get("last_backup_fingerprint"):
+                logger.info("Data unchanged since last backup, auto backup skipped")
+                self.config["last_backup_time"] = datetime.now().isoformat()
+                self._save_config()
+                return None
+            # 简化自动备份文件名
+            backup_name = f"auto_{datetime.now().strftime('%m%d_%H%M')}"
+            # 类型与描述直接写进信息文件，不再事后重写一遍
+            return self._create_backup(backup_name, backup_type="auto", description="自动备份")
+        finally:
+            self._backup_lock.release()
 
 
 # 单例实例
@@ -1,14 +1,14 @@
 # server/app/services/collection_service.py
 from __future__ import annotations
 
-from datetime import datetime
 from typing import Iterable, List, Optional, Tuple, Dict, Set
 
 from sqlalchemy import select, func, asc, desc, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, selectinload
 
-from ..models import Monster, Collection, CollectionItem
+from ..models import Monster, Collection, CollectionItem, utcnow
 
 
 # ---------------------------
@@ -23,10 +23,6 @@ def _uniq_int_ids(ids: Iterable[int]) -> List[int]:
     return list({int(i) for i in (ids or []) if isinstance(i, int) or str(i).isdigit()})
 
 
-def _now() -> datetime:
-    return datetime.utcnow()
-
-
 # ---------------------------
 # 收藏夹：CRUD + 列表
 # ---------------------------
@@ -76,7 +72,7 @@ def delete_collection(db: Session, collection_id: int) -> bool:
     col = get_collection_by_id(db, collection_id)
     if not col:
         return False
-    # 由于 Collection.items 关系上已设置 delete-orphan，直接删主表即可级联清理
+    # 成员由外键 ON DELETE CASCADE 清理（Collection.items 为 passive_deletes，不会先加载成员）
     db.delete(col)
     db.flush()
     return True
@@ -92,26 +88,14 @@ def list_collections(
     page_size: int = 50,
 ) -> Tuple[List[Collection], int]:
     """
-    返回带 items_count 的收藏夹列表（items_count 为临时属性，便于 Pydantic 输出）。
+    返回收藏夹列表（items_count 为触发器维护的列）。
     """
     page = max(1, int(page))
     page_size = min(200, max(1, int(page_size)))
     direction = _direction(order)
 
-    # 成员计数子查询
-    cnt_sub = (
-        select(CollectionItem.collection_id, func.count(CollectionItem.monster_id).label("cnt"))
-        .group_by(CollectionItem.collection_id)
-        .subquery()
-    )
-
-    base = (
-        select(
-            Collection,
-            func.coalesce(cnt_sub.c.cnt, 0).label("items_count"),
-        )
-        .outerjoin(cnt_sub, cnt_sub.c.collection_id == Collection.id)
-    )
+    # items_count 为触发器维护的冗余列，直接读取，不再对 collection_items 分组计数
+    base = select(Collection)
 
     # 过滤
     like = None
@@ -128,22 +112,16 @@ def list_collections(
     # 排序
     s = (sort or "updated_at").lower()
     if s == "items_count":
-        base = base.order_by(direction(func.coalesce(cnt_sub.c.cnt, 0)), asc(Collection.id))
+        base = base.order_by(direction(Collection.items_count), asc(Collection.id))
     elif s in {"updated_at", "created_at", "name", "last_used_at"}:
         col = getattr(Collection, s)
         base = base.order_by(direction(col), asc(Collection.id))
     else:
         base = base.order_by(direction(Collection.updated_at), asc(Collection.id))
 
-    rows = db.execute(
+    items = list(db.scalars(
         base.limit(page_size).offset((page - 1) * page_size)
-    ).all()
-
-    items: List[Collection] = []
-    for col, items_count in rows:
-        # 注入临时属性，Pydantic(from_attributes=True) 可读取
-        setattr(col, "items_count", int(items_count or 0))
-        items.append(col)
+    ).all())
 
     return items, int(total)
 
@@ -168,6 +146,27 @@ def _existing_member_ids(db: Session, collection_id: int, candidate_ids: Iterabl
     return set(int(x) for x in rows or [])
 
 
+# 每条多行 INSERT 的行数：每行 2 个绑定参数，400 行 = 800 个，低于旧版 SQLite 的 999 参数上限
+_INSERT_CHUNK = 400
+
+
+def _insert_members(db: Session, collection_id: int, monster_ids: List[int]) -> int:
+    """
+    分块执行 INSERT ... ON CONFLICT DO NOTHING 批量加入成员；已存在的（含并发写入的）由复合主键去重。
+    返回实际新增的行数。
+    """
+    added = 0
+    for i in range(0, len(monster_ids), _INSERT_CHUNK):
+        chunk = monster_ids[i:i + _INSERT_CHUNK]
+        res = db.execute(
+            sqlite_insert(CollectionItem)
+            .values([{"collection_id": collection_id, "monster_id": mid} for mid in chunk])
+            .on_conflict_do_nothing(index_elements=["collection_id", "monster_id"])
+        )
+        added += max(res.rowcount or 0, 0)
+    return added
+
+
 def _existing_monster_ids(db: Session, candidate_ids: Iterable[int]) -> Set[int]:
     """
     返回数据库中实际存在的怪物 ID（用于跳过无效 ID）。
@@ -227,16 +226,13 @@ def bulk_set_members(
     exist_ids = _existing_monster_ids(db, want_ids)
     missing = [i for i in want_ids if i not in exist_ids]
 
-    # 当前已有
-    curr_ids = _existing_member_ids(db, col.id, exist_ids)
-
     added = removed = skipped = 0
 
+    # 当前已有（add 不需要：冲突行由 ON CONFLICT 跳过，rowcount 即新增数）
+    curr_ids = _existing_member_ids(db, col.id, exist_ids) if action != "add" else set()
+
     if action == "add":
-        to_add = sorted(exist_ids - curr_ids)
-        for mid in to_add:
-            db.add(CollectionItem(collection_id=col.id, monster_id=mid))
-        added = len(to_add)
+        added = _insert_members(db, col.id, sorted(exist_ids))
 
     elif action == "remove":
         to_remove = sorted(curr_ids & exist_ids)
@@ -253,8 +249,7 @@ def bulk_set_members(
         # 目标 = exist_ids；执行“差异化覆盖”
         to_add = sorted(exist_ids - curr_ids)
         to_del = sorted(curr_ids - exist_ids)
-        for mid in to_add:
-            db.add(CollectionItem(collection_id=col.id, monster_id=mid))
+        added = _insert_members(db, col.id, to_add)
         if to_del:
             db.execute(
                 delete(CollectionItem).where(
@@ -262,7 +257,6 @@ def bulk_set_members(
                     CollectionItem.monster_id.in_(to_del),
                 )
             )
-        added = len(to_add)
         removed = len(to_del)
 
     else:
@@ -270,12 +264,12 @@ def bulk_set_members(
 
     # 统计“跳过”的条目：对于 add 是已存在；对于 remove 是不存在；对于 set 则不适用
     if action == "add":
-        skipped = len(curr_ids & exist_ids)
+        skipped = len(exist_ids) - added
     elif action == "remove":
         skipped = len(exist_ids - curr_ids)
 
-    # 触摸 last_used_at
-    col.last_used_at = _now()
+    # 触摸 last_used_at：与 created_at/updated_at 一样由 SQL 端取当前 UTC 时间
+    col.last_used_at = utcnow()
 
     # 提前 flush 以捕获唯一约束错误（极端并发）
     try:
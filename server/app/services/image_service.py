@@ -1,6 +1,7 @@
 # server/app/services/image_service.py
 from __future__ import annotations
 import os, re
+import threading
 from pathlib import Path
 from typing import Dict, Optional, List, Tuple
 from difflib import SequenceMatcher
@@ -29,7 +30,8 @@ class ImageResolver:
         """
         扫描目录建立索引：文件名（去扩展名）-> 文件相对名（含扩展名）
         """
-        self._index.clear()
+        # 先建新索引再整体替换，后台预热期间的查询不会看到半成品
+        index: Dict[str, str] = {}
         if not self.dir_path.exists():
             self.dir_path.mkdir(parents=True, exist_ok=True)
 
@@ -44,8 +46,9 @@ class ImageResolver:
             if not key:
                 continue
             # 后写覆盖前写：让你手工替换图片时，以最新为准
-            self._index[key] = p.name
-        return len(self._index)
+            index[key] = p.name
+        self._index = index
+        return len(index)
 
     def _score(self, a: str, b: str) -> float:
         return SequenceMatcher(None, a, b).ratio()
@@ -93,10 +96,15 @@ class ImageResolver:
 
 # ---- 单例获取 ----
 _resolver: Optional[ImageResolver] = None
+_resolver_lock = threading.Lock()
 
 def get_image_resolver() -> ImageResolver:
     global _resolver
-    if _resolver is None:
+    if _resolver is not None:
+        return _resolver
+    with _resolver_lock:
+        if _resolver is not None:
+            return _resolver
         base = os.getenv("KBXY_IMAGES_DIR")
         if base:
             dir_path = Path(base)
@@ -104,6 +112,7 @@ def get_image_resolver() -> ImageResolver:
             # 默认：项目根/server/images/monsters
             here = Path(__file__).resolve().parents[2]
             dir_path = here / "images" / "monsters"
-        _resolver = ImageResolver(dir_path)
-        _resolver.reindex()
+        resolver = ImageResolver(dir_path)
+        resolver.reindex()
+        _resolver = resolver
     return _resolver
\ No newline at end of file
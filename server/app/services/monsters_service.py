@@ -3,7 +3,7 @@ from __future__ import annotations
 
 from typing import List, Tuple, Optional, Dict, Any
 
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import select, func, asc, desc, outerjoin, case, distinct, or_
 
 from ..models import Monster, Tag, MonsterSkill, Skill, CollectionItem
@@ -258,6 +258,8 @@ def list_monsters(
     is_asc = (order or "desc").lower() == "asc"
     rows_stmt = rows_stmt.order_by(asc(sort_col) if is_asc else desc(sort_col), asc(Monster.id))
     rows_stmt = rows_stmt.offset((page - 1) * page_size).limit(page_size)
+    # 列表输出需要标签：随本页一起 selectinload（一次 IN 查询），不用 joinedload 以免与标签 JOIN 行数膨胀
+    rows_stmt = rows_stmt.options(selectinload(Monster.tags))
 
     rows = db.scalars(rows_stmt).unique().all()
     return rows, int(total)
@@ -277,13 +279,23 @@ def upsert_tags(db: Session, names: List[str]) -> List[Tag]:
             continue
         seen.add(n)
         uniq.append(n)
+    if not uniq:
+        return result
+    # 一次 IN 查询取回已有标签，缺失的统一新增后只 flush 一次
+    existing = {
+        t.name: t for t in db.execute(select(Tag).where(Tag.name.in_(uniq))).scalars()
+    }
+    created = False
     for n in uniq:
-        tag = db.execute(select(Tag).where(Tag.name == n)).scalar_one_or_none()
-        if not tag:
+        tag = existing.get(n)
+        if tag is None:
             tag = Tag(name=n)
             db.add(tag)
-            db.flush()
+            existing[n] = tag
+            created = True
         result.append(tag)
+    if created:
+        db.flush()
     return result
 
 
@@ -328,7 +340,10 @@ def auto_match_monsters(
     details: List[Dict[str, Any]] = []
 
     for mid in id_list:
-        m = db.get(Monster, int(mid))
+        m = db.get(
+            Monster, int(mid),
+            options=[selectinload(Monster.monster_skills).selectinload(MonsterSkill.skill)],
+        )
         if not m:
             failed += 1
             details.append({"id": mid, "ok": False, "error": "monster not found"})
@@ -31,16 +31,15 @@ def _to_lower_no_space(s: str) -> str:
 #   - 其它值保留原文裁剪（因为项目里系别较多，统一真源是 type_chart）
 #   - 空/未知 → 返回 None
 _SPECIAL_TOKENS = {"特", "特殊", "无", "無", "无属性", "无系", "—", "-", "*"}
+# 规范化后的 key 只算一次；含英文/拼音少量输入
+_SPECIAL_KEYS = frozenset({_to_lower_no_space(x) for x in _SPECIAL_TOKENS} | {"none", "null"})
 
 def normalize_element(value: Optional[str]) -> Optional[str]:
     s = _clean(value)
     if not s:
         return None
     key = _to_lower_no_space(s)
-    if key in { _to_lower_no_space(x) for x in _SPECIAL_TOKENS }:
-        return "特殊"
-    # 兼容英文/拼音少量输入
-    if key in {"none", "null"}:
+    if key in _SPECIAL_KEYS:
         return "特殊"
     return s  # 其它保持原文（已裁剪/标准化）
 
@@ -55,6 +54,10 @@ _KIND_MAP = {
     "特": "特殊", "特殊": "特殊", "变化": "特殊", "辅助": "特殊", "状态": "特殊",
     "support": "特殊", "status": "特殊",
 }
+# 预先按规范化 key 建表（保留首个等价键的映射）
+_KIND_KEYS: dict = {}
+for _k, _v in _KIND_MAP.items():
+    _KIND_KEYS.setdefault(_to_lower_no_space(_k), _v)
 
 def normalize_kind(value: Optional[str]) -> Optional[str]:
     s = _clean(value)
@@ -62,11 +65,9 @@ def normalize_kind(value: Optional[str]) -> Optional[str]:
         return None
     key = _to_lower_no_space(s)
     # 直接映射命中
-    if key in { _to_lower_no_space(k): v for k, v in _KIND_MAP.items() }:
-        # 找到首个等价键
-        for k, v in _KIND_MAP.items():
-            if _to_lower_no_space(k) == key:
-                return v
+    hit = _KIND_KEYS.get(key)
+    if hit is not None:
+        return hit
     # 常见单字简写
     if key in {"物", "wuli"}:
         return "物理"
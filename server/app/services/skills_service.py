@@ -37,6 +37,14 @@ KEYWORD_TAGS: list[tuple[str, str]] = [
     (r"暴击", "暴击"),
 ]
 
+# 预编译：upsert 时每个技能都要判定，避免逐次走 re 模块缓存查找
+_KEYWORD_TAGS_COMPILED: list[tuple[re.Pattern, str]] = [(re.compile(p), t) for p, t in KEYWORD_TAGS]
+_DESC_PUNCT_RE = re.compile(r"[，。；、,.]")
+_DESC_WORDS_RE = re.compile(r"(提高|降低|回复|免疫|伤害|回合|命中|几率|状态|先手|消除|减少|增加|额外|倍)")
+_NAME_JUNK_RE = re.compile(r"[\d\-\—\s]+")
+_NAME_WORD_RE = re.compile(r"[\u4e00-\u9fffA-Za-z]")
+_INT_RE = re.compile(r"-?\d+")
+
 TRIVIAL_DESCS = {"", "0", "1", "-", "—", "无", "暂无", "null", "none", "N/A", "n/a"}
 
 
@@ -50,8 +58,8 @@ def _is_meaningful_desc(s: str) -> bool:
         return False
     return (
         len(s) >= 6
-        or re.search(r"[，。；、,.]", s)
-        or re.search(r"(提高|降低|回复|免疫|伤害|回合|命中|几率|状态|先手|消除|减少|增加|额外|倍)", s)
+        or _DESC_PUNCT_RE.search(s)
+        or _DESC_WORDS_RE.search(s)
     )
 
 
@@ -60,16 +68,16 @@ def _is_valid_skill_name(name: str) -> bool:
     s = _clean(name)
     if not s:
         return False
-    if re.fullmatch(r"[\d\-\—\s]+", s):
+    if _NAME_JUNK_RE.fullmatch(s):
         return False
-    return bool(re.search(r"[\u4e00-\u9fffA-Za-z]", s))
+    return bool(_NAME_WORD_RE.search(s))
 
 
 def derive_tags_from_texts(texts: Iterable[str]) -> Set[str]:
     merged = "；".join([_clean(t) for t in texts if _clean(t)])
     tags: set[str] = set()
-    for pat, tag in KEYWORD_TAGS:
-        if re.search(pat, merged):
+    for pat, tag in _KEYWORD_TAGS_COMPILED:
+        if pat.search(merged):
             tags.add(tag)
     return tags
 
@@ -106,7 +114,7 @@ def _norm_power(power: Optional[int | str]) -> Optional[int]:
     s = _clean(str(power))
     if not s:
         return None
-    m = re.search(r"-?\d+", s)
+    m = _INT_RE.search(s)
     return int(m.group()) if m else None
 
 
@@ -132,32 +140,39 @@ def upsert_skills(
     策略
     ----
     - 过滤无效技能名（纯数字/标点等）。
-    - 查询条件：Skill.name == name AND Skill.element == element AND Skill.kind == kind AND Skill.power == power AND Skill.pp == pp
-    - 不存在则创建；存在则仅在"新描述更像描述或更长"时覆盖旧描述。
+    - 按技能名一次 IN 查询取回候选，再在内存中按 (name, element, kind, power, pp) 精确匹配。
+    - 不存在则创建（最后统一 flush 一次）；存在则仅在"新描述更像描述或更长"时覆盖旧描述。
     - 返回所有成功入库（新建或找到）的 Skill 实体，供上层关系绑定。
     """
     results: List[Skill] = []
 
+    # 先规范化并过滤，再按技能名一次性取回候选，避免逐条 SELECT
+    rows = []
     for name, element, kind, power, pp, desc in items:
         name = _clean(name)
         if not _is_valid_skill_name(name):
             continue
-
-        element = _norm_element(element)
-        kind = _norm_kind(kind)
-        power = _norm_power(power)
-        pp = _norm_power(pp)  # 复用相同的处理逻辑
-        desc = _clean(desc)
-
+        rows.append((
+            name,
+            _norm_element(element),
+            _norm_kind(kind),
+            _norm_power(power),
+            _norm_power(pp),  # 复用相同的处理逻辑
+            _clean(desc),
+        ))
+    if not rows:
+        return results
+
+    names = list({r[0] for r in rows})
+    by_key = {
+        (sk.name, sk.element, sk.kind, sk.power, sk.pp): sk
+        for sk in db.execute(select(Skill).where(Skill.name.in_(names))).scalars()
+    }
+
+    created = False
+    for name, element, kind, power, pp, desc in rows:
         # 查找唯一键命中
-        stmt = select(Skill).where(
-            Skill.name == name,
-            Skill.element == element,
-            Skill.kind == kind,
-            Skill.power == power,
-            Skill.pp == pp,
-        )
-        skill = db.execute(stmt).scalar_one_or_none()
+        skill = by_key.get((name, element, kind, power, pp))
 
         if not skill:
             # 新建：仅在描述"像描述"时保存，否则给空串
@@ -170,7 +185,8 @@ def upsert_skills(
                 description=desc if _is_meaningful_desc(desc) else "",
             )
             db.add(skill)
-            db.flush()  # 拿到 id
+            by_key[(name, element, kind, power, pp)] = skill
+            created = True
         else:
             # 更新策略：新描述更"像描述"，或（两者都像描述但新更长）才覆盖
             if _is_meaningful_desc(desc):
@@ -180,4 +196,6 @@ def upsert_skills(
 
         results.append(skill)
 
+    if created:
+        db.flush()  # 统一拿到 id
     return results
\ No newline at end of file
@@ -14,6 +14,8 @@ from datetime import datetime, timezone
 from typing import List, Set, Dict, Tuple, Any, Optional, Callable
 from pathlib import Path
 
+import orjson
+
 try:
     import httpx  # 仅 AI 接口需要；未安装也不影响正则路径
     _HAS_HTTPX = True
@@ -24,7 +26,7 @@ from sqlalchemy import select
     # noqa: E402
 from sqlalchemy.orm import selectinload
 
-from ..models import Monster
+from ..models import Monster, MonsterSkill
 
 # ======================
 # 目录加载 / 热更新
@@ -85,7 +87,8 @@ _CACHE = _CatalogCache()
 # ============
 
 def _now() -> float:
-    return time.time()
+    # 仅用于 TTL 计时：单调时钟不受系统改时影响
+    return time.monotonic()
 
 def _file_mtime(path: str) -> float:
     try:
@@ -93,6 +96,27 @@ def _file_mtime(path: str) -> float:
     except Exception:
         return 0.0
 
+# 含反向引用/命名组/全局内联标志的正则不能安全地拼进同一个分支里
+_UNMERGEABLE_RE = re.compile(r"\\[1-9]|\(\?P[<=]|\(\?[aiLmsux]+\)")
+
+def _compile_code_patterns(expanded: List[str]) -> List[re.Pattern]:
+    """
+    把同一 code 的多条正则合成一个分支正则，一次 search 判定命中；
+    无法合并时退回逐条编译的列表（非法正则跳过）。
+    """
+    comps: List[re.Pattern] = []
+    for s in expanded:
+        try:
+            comps.append(re.compile(s))
+        except Exception:
+            pass
+    if len(comps) <= 1 or any(_UNMERGEABLE_RE.search(c.pattern) for c in comps):
+        return comps
+    try:
+        return [re.compile("|".join(f"(?:{c.pattern})" for c in comps))]
+    except Exception:
+        return comps
+
 # ======================
 # 读目录（兼容旧/新结构）
 # ======================
@@ -138,19 +162,18 @@ def _schema_is_old(data: Dict[str, Any]) -> bool:
 
 def load_catalog(force: bool = False) -> Dict[str, Any]:
     with _CACHE.lock:
-        need_reload = force
-        if not need_reload:
-            if (_now() - _CACHE.loaded_at) >= TAGS_CATALOG_TTL:
-                need_reload = True
-            cur_mtime = _file_mtime(TAGS_CATALOG_PATH)
-            if cur_mtime != _CACHE.mtime:
-                need_reload = True
-        if not need_reload and _CACHE.data:
-            return _CACHE.data
+        if not force and _CACHE.data:
+            # TTL 内不碰文件系统；TTL 到期只 stat 一次，mtime 未变则继续复用已解析/编译的结果
+            now = _now()
+            if (now - _CACHE.loaded_at) < TAGS_CATALOG_TTL:
+                return _CACHE.data
+            if _file_mtime(TAGS_CATALOG_PATH) == _CACHE.mtime:
+                _CACHE.loaded_at = now
+                return _CACHE.data
 
         try:
-            with open(TAGS_CATALOG_PATH, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            with open(TAGS_CATALOG_PATH, "rb") as f:
+                data = orjson.loads(f.read())
         except Exception as e:
             raise RuntimeError(f"加载标签目录失败：{TAGS_CATALOG_PATH}，{e}")
 
@@ -171,13 +194,7 @@ def load_catalog(force: bool = False) -> Dict[str, Any]:
             arr = list(by_code.get(code, []) or [])
             expanded = [str(p).format(**macros) if "{" in str(p) else str(p) for p in arr]
             patterns_by_code[code] = expanded
-            comps: List[re.Pattern] = []
-            for s in expanded:
-                try:
-                    comps.append(re.compile(s))
-                except Exception:
-                    pass
-            compiled_by_code[code] = comps
+            compiled_by_code[code] = _compile_code_patterns(expanded)
 
         keywords_by_code = {c: list(kws.get(c, []) or []) for c in all_codes}
 
@@ -239,24 +256,17 @@ _init_static_exports()
 # ======================
 
 def _skills_iter(monster: Monster, selected_only: bool = True):
-    # 优先使用 monster_skills 来检查 selected 状态，这是正确的数据源
-    if getattr(monster, "monster_skills", None):
-        for ms in monster.monster_skills:
-            # 如果启用了只使用推荐技能，且该技能未被选择为推荐，则跳过
-            if selected_only and not getattr(ms, "selected", False):
-                continue
-            s = getattr(ms, "skill", None)
-            if s is None:
-                yield None, None, None
-            else:
-                desc = getattr(s, "description", None)
-                yield getattr(s, "id", None), getattr(s, "name", None), desc
-        return
-    # 兼容旧的 skills 代理（如果 monster_skills 不存在）
-    if getattr(monster, "skills", None):
-        for s in monster.skills:
-            # 注意：这个分支无法检查 selected 状态，因为 skills 是代理
-            yield getattr(s, "id", None), getattr(s, "name", None), getattr(s, "description", None)
+    # 直接遍历 monster_skills 关联对象（selected 只在这里有）；
+    # 不走 skills 代理：代理每次访问都会构造包装对象，且 monster_skills 为空时它同样为空
+    for ms in (getattr(monster, "monster_skills", None) or ()):
+        # 如果启用了只使用推荐技能，且该技能未被选择为推荐，则跳过
+        if selected_only and not ms.selected:
+            continue
+        s = ms.skill
+        if s is None:
+            yield None, None, None
+        else:
+            yield s.id, s.name, s.description
 
 def _skill_texts(monster: Monster, selected_only: bool = True) -> List[Tuple[Optional[int], str, str]]:
     out = []
@@ -288,30 +298,40 @@ def _hit_any(patterns: List[Any], text: str) -> bool:
 # PP压制严格守卫
 # ======================
 
-# 只有**明确描述**“减少/降低/扣/削减 对手 技能使用次数 / PP”才算
-def _pp_drain_strict(text: str) -> bool:
-    if not text:
-        return False
-    t = str(text)
-    M = _CACHE.macros or {}
-    ENEMY = M.get("ENEMY", r"(?:对方|对手|敌(?:人|方))")
-    ONE_OR_TWO = M.get("ONE_OR_TWO", r"(?:一|1|两|2|一或两|1或2|1-2|1～2|1~2)")
+# 排除 “PP为0/等于0/耗尽则…” 的叙述（非动作）
+_PP_ZERO_RE = re.compile(r"PP.*?(?:为|等于)\s*0|PP.*?耗尽")
+
+@lru_cache(maxsize=8)
+def _pp_drain_rules(enemy: str, one_or_two: str) -> Optional[re.Pattern]:
+    """按宏展开并合并成一个分支正则；宏不变时复用编译结果"""
     rules = [
-        rf"(?:随机)?(?:减少|降低|扣|削减)\s*{ENEMY}.*?(?:所有)?(?:技能|招式).*(?:使用)?次数(?:{ONE_OR_TWO})?次",
+        rf"(?:随机)?(?:减少|降低|扣|削减)\s*{enemy}.*?(?:所有)?(?:技能|招式).*(?:使用)?次数(?:{one_or_two})?次",
         r"(?:减少|降低|扣|削减)\s*PP(?:值|点|點)?",
         r"PP(?:值)?\s*(?:减少|降低|扣|削减)",
-        rf"使\s*{ENEMY}.*?(?:技能|招式).*(?:次数|使用次数).*(?:减少|降低|扣|削减)"
+        rf"使\s*{enemy}.*?(?:技能|招式).*(?:次数|使用次数).*(?:减少|降低|扣|削减)"
     ]
+    comps: List[re.Pattern] = []
     for r in rules:
         try:
-            if re.search(r, t):
-                # 排除 “PP为0/等于0/耗尽则…” 的叙述（非动作）
-                if re.search(r"PP.*?(?:为|等于)\s*0|PP.*?耗尽", t):
-                    continue
-                return True
+            comps.append(re.compile(r))
         except Exception:
             continue
-    return False
+    if not comps:
+        return None
+    return re.compile("|".join(f"(?:{c.pattern})" for c in comps))
+
+# 只有**明确描述**“减少/降低/扣/削减 对手 技能使用次数 / PP”才算
+def _pp_drain_strict(text: str) -> bool:
+    if not text:
+        return False
+    t = str(text)
+    M = _CACHE.macros or {}
+    ENEMY = M.get("ENEMY", r"(?:对方|对手|敌(?:人|方))")
+    ONE_OR_TWO = M.get("ONE_OR_TWO", r"(?:一|1|两|2|一或两|1或2|1-2|1～2|1~2)")
+    rules = _pp_drain_rules(str(ENEMY), str(ONE_OR_TWO))
+    if rules is None or not rules.search(t):
+        return False
+    return not _PP_ZERO_RE.search(t)
 
 # ======================
 # 正则标签建议
@@ -662,11 +682,13 @@ class BatchJobState:
     errors: List[Dict[str, Any]] = field(default_factory=list)
     started_at: float = field(default_factory=lambda: time.time())
     updated_at: float = field(default_factory=lambda: time.time())
+    # 耗时/ETA 用单调时钟计算；started_at/updated_at 只用于展示
+    started_mono: float = field(default_factory=time.monotonic)
 
     def to_dict(self) -> Dict[str, Any]:
         processed = self.done + self.failed
         pct = (processed / self.total) if self.total > 0 else 1.0
-        elapsed = time.time() - self.started_at
+        elapsed = time.monotonic() - self.started_mono
         speed = (processed / elapsed) if elapsed > 0 else 0.0
         eta = int((self.total - processed) / speed) if speed > 0 else None
         def _iso(ts: float) -> str:
@@ -763,8 +785,10 @@ def start_ai_batch_tagging(ids: List[int], db_factory: Callable[[], Any]) -> str
         try:
             from ..config import settings
             use_selected_only = settings.tag_use_selected_only
+            batch_size = max(1, int(settings.tag_batch_size))
         except Exception:
             use_selected_only = True  # 默认值
+            batch_size = 10
         
         try:
             # 批量获取怪物数据
@@ -773,7 +797,10 @@ def start_ai_batch_tagging(ids: List[int], db_factory: Callable[[], Any]) -> str
                 monsters = session.execute(
                     select(Monster)
                     .where(Monster.id.in_(_ids))
-                    .options(selectinload(Monster.monster_skills), selectinload(Monster.tags))
+                    .options(
+                        selectinload(Monster.monster_skills).selectinload(MonsterSkill.skill),
+                        selectinload(Monster.tags),
+                    )
                 ).scalars().all()
                 
                 # 提取技能文本
@@ -791,11 +818,9 @@ def start_ai_batch_tagging(ids: List[int], db_factory: Callable[[], Any]) -> str
                     except Exception as e:
                         _registry.update(_job_id, failed_inc=1, error={"id": m.id, "error": str(e)})
                 
-                # 小批量AI调用以提供实时进度
+                # 小批量AI调用以提供实时进度；每批结果一次提交（批大小见 settings.tag_batch_size）
                 if monster_texts:
                     try:
-                        # 分批处理，每批10个，提供实时进度
-                        batch_size = 10
                         for batch_start in range(0, len(monster_texts), batch_size):
                             cur = _registry.get(_job_id)
                             if cur and cur.canceled:
@@ -807,23 +832,37 @@ def start_ai_batch_tagging(ids: List[int], db_factory: Callable[[], Any]) -> str
                             # 批量AI调用
                             batch_results = asyncio.run(ai_classify_batch_concurrent(batch_texts))
                             
-                            # 处理这批结果
+                            # 转换为标签列表
+                            batch_tags: List[Tuple[Monster, List[str]]] = []
                             for i, ai_result in enumerate(batch_results):
-                                cur = _registry.get(_job_id)
-                                if cur and cur.canceled:
-                                    _registry.update(_job_id, running=False); return
-                                
                                 global_index = batch_start + i
                                 if global_index in monster_map:
-                                    m = monster_map[global_index]
+                                    tags = []
+                                    for cat in ("buff", "debuff", "special"):
+                                        tags.extend(ai_result.get(cat, []))
+                                    batch_tags.append((monster_map[global_index], tags))
+                            
+                            cur = _registry.get(_job_id)
+                            if cur and cur.canceled:
+                                _registry.update(_job_id, running=False); return
+                            
+                            # 整批写入后提交一次；失败则回滚并逐条重试，定位出错的怪物。
+                            # 整批标签名取并集只 upsert 一次（一次 IN 查询 + 至多一次 flush），再按名称在内存中回填
+                            try:
+                                tag_by_name = {
+                                    t.name: t
+                                    for t in upsert_tags(session, [n for _, tags in batch_tags for n in tags])
+                                }
+                                for m, tags in batch_tags:
+                                    names = dict.fromkeys((s or "").strip() for s in tags)
+                                    m.tags = [tag_by_name[n] for n in names if n]
+                                session.commit()
+                                _registry.update(_job_id, done_inc=len(batch_tags))
+                            except Exception:
+                                session.rollback()
+                                for m, tags in batch_tags:
                                     try:
-                                        # 转换为标签列表
-                                        tags = []
-                                        for cat in ("buff", "debuff", "special"):
-                                            tags.extend(ai_result.get(cat, []))
-                                        
                                         m.tags = upsert_tags(session, tags)
-                                        # 立即提交单个更新以提供实时进度
                                         session.commit()
                                         _registry.update(_job_id, done_inc=1)
                                     except Exception as e:
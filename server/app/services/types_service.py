@@ -3,9 +3,10 @@ from __future__ import annotations
 
 from pathlib import Path
 from typing import Dict, Any, List, Optional
-import json
 import threading
 
+import orjson
+
 
 class TypeChartService:
     """
@@ -34,7 +35,7 @@ class TypeChartService:
                 raise FileNotFoundError(f"type_chart.json not found: {self._path}")
             m = self._path.stat().st_mtime
             if force or m != self._mtime:
-                data = json.loads(self._path.read_text(encoding="utf-8"))
+                data = orjson.loads(self._path.read_bytes())
                 if not isinstance(data, dict):
                     raise ValueError("type_chart.json must be an object at top level")
                 self._chart = data
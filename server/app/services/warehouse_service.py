@@ -4,7 +4,7 @@ from __future__ import annotations
 from typing import Iterable, List, Tuple, Optional
 
 from sqlalchemy.orm import Session, selectinload
-from sqlalchemy import select, func, asc, desc, or_
+from sqlalchemy import select, func, asc, desc, or_, update, case
 
 from ..models import Monster, MonsterSkill, Skill, Tag
 
@@ -34,26 +34,30 @@ def bulk_set_warehouse(db: Session, ids: Iterable[int], possess: bool) -> int:
     """
     批量设置 possess；返回实际变更的数量。
     """
-    changed = 0
     uniq_ids = list({int(i) for i in (ids or [])})
     if not uniq_ids:
         return 0
-    for mid in uniq_ids:
-        m = db.get(Monster, mid)
-        if not m:
-            continue
-        if bool(getattr(m, "possess", False)) != possess:
-            m.possess = possess
-            changed += 1
-    if changed:
-        db.flush()
-    return changed
+    # 单条 UPDATE 完成批量设置，只改动值确实不同的行
+    res = db.execute(
+        update(Monster)
+        .where(
+            Monster.id.in_(uniq_ids),
+            or_(Monster.possess.is_(None), Monster.possess != possess),
+        )
+        .values(possess=possess)
+    )
+    return int(res.rowcount or 0)
 
 
 # -------- 统计 --------
 def warehouse_stats(db: Session) -> dict:
-    total = db.scalar(select(func.count(Monster.id))) or 0
-    owned = db.scalar(select(func.count(Monster.id)).where(Monster.possess.is_(True))) or 0
+    # 一次聚合同时得到总数与已拥有数
+    total, owned = db.execute(
+        select(
+            func.count(Monster.id),
+            func.coalesce(func.sum(case((Monster.possess.is_(True), 1), else_=0)), 0),
+        )
+    ).one()
     not_owned = int(total) - int(owned)
     # 保留兼容字段 in_warehouse
     return {